@@ -0,0 +1,22 @@
+"""
+Password hashers with their cost taken from the settings.
+
+Django stores the cost in every hash and rehashes a password when its
+user next logs in with different costs (see PASSWORD_HASHER_PROFILES in
+mysite/settings.py), so the costs can be changed at any time.
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import (Argon2PasswordHasher,
+                                         ScryptPasswordHasher)
+
+
+class TunedScryptPasswordHasher(ScryptPasswordHasher):
+    """scrypt with SCRYPT_WORK_FACTOR (N); memory use is 128 * N * 8 bytes."""
+    work_factor = settings.SCRYPT_WORK_FACTOR
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2id with ARGON2_TIME_COST and ARGON2_MEMORY_COST (in KiB)."""
+    time_cost = settings.ARGON2_TIME_COST
+    memory_cost = settings.ARGON2_MEMORY_COST
+    parallelism = 1
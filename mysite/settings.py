@@ -11,7 +11,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
 from pathlib import Path
-from decouple import config, Csv
+from decouple import config, Choices, Csv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -42,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'polls.middleware.QueryMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -51,16 +52,54 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-MESSAGE_STORAGE = 'django.contrib.messages.storage.session.SessionStorage'
+# Where sessions and flash messages are kept, chosen with SESSION_PROFILE:
+# - db: both in the database, a read and a write for most requests;
+# - cached_db: sessions read from the cache (use CACHE_DIR or REDIS_URL
+#   with several processes), messages in a cookie while they fit;
+# - signed_cookies: both in signed cookies, with no database access.  The
+#   session holds the user's votes (polls.voting), so it grows by a few
+#   bytes per vote towards the 4 kB cookie limit.
+SESSION_PROFILES = {
+    'db': {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+        'MESSAGE_STORAGE':
+            'django.contrib.messages.storage.session.SessionStorage',
+    },
+    'cached_db': {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db',
+        'MESSAGE_STORAGE':
+            'django.contrib.messages.storage.fallback.FallbackStorage',
+    },
+    'signed_cookies': {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.signed_cookies',
+        'MESSAGE_STORAGE':
+            'django.contrib.messages.storage.cookie.CookieStorage',
+    },
+}
+SESSION_PROFILE = config("SESSION_PROFILE", default="db",
+                         cast=Choices(list(SESSION_PROFILES)))
+SESSION_ENGINE = SESSION_PROFILES[SESSION_PROFILE]['SESSION_ENGINE']
+MESSAGE_STORAGE = SESSION_PROFILES[SESSION_PROFILE]['MESSAGE_STORAGE']
 
 ROOT_URLCONF = 'mysite.urls'
 
+# Templates are compiled once per process and kept in memory, except with
+# DEBUG, where they are read again on every render so edits show at once.
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if not DEBUG:
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+    ]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -84,6 +123,118 @@ DATABASES = {
     }
 }
 
+# Production SQLite profile: WAL journal so readers are not blocked by vote
+# writers, a busy timeout instead of immediate "database is locked" errors,
+# persistent connections, and transactions that take the write lock when
+# they begin (mysite/sqlite3), so that concurrent vote writers wait for the
+# busy timeout.  The pragmas are run on each new connection by
+# polls.signals.configure_sqlite.
+SQLITE_PRODUCTION = config("SQLITE_PRODUCTION", default=False, cast=bool)
+SQLITE_PRAGMAS = {}
+if SQLITE_PRODUCTION:
+    # django.db.backends.sqlite3 with BEGIN IMMEDIATE transactions
+    DATABASES['default']['ENGINE'] = 'mysite.sqlite3'
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': config("SQLITE_BUSY_TIMEOUT", default=5000, cast=int),
+        'mmap_size': config("SQLITE_MMAP_SIZE", default=268435456, cast=int),
+        # negative values are in KiB
+        'cache_size': config("SQLITE_CACHE_SIZE", default=-20000, cast=int),
+    }
+    DATABASES['default']['CONN_MAX_AGE'] = config("CONN_MAX_AGE", default=600,
+                                                  cast=int)
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+# The cache holds rendered page fragments and their version stamps.  The
+# default in-memory cache is private to each process; when running several
+# worker processes set CACHE_DIR (file-based cache) or REDIS_URL (needs the
+# redis package) so that every process sees the same versions.
+REDIS_URL = config("REDIS_URL", default="")
+CACHE_DIR = config("CACHE_DIR", default="")
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+elif CACHE_DIR:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': CACHE_DIR,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Seconds the rendered question list of the index page may be cached.
+INDEX_CACHE_TIMEOUT = config("INDEX_CACHE_TIMEOUT", default=300, cast=int)
+# Seconds a rendered results table or vote history may be cached.  A vote
+# replaces them at once in the process that saved it, and in every process
+# that shares the cache; with the in-memory cache other processes show
+# the old counts until this runs out.
+RESULTS_CACHE_TIMEOUT = config("RESULTS_CACHE_TIMEOUT", default=60, cast=int)
+
+
+# Addresses of the reverse proxies in front of the site, whose
+# X-Forwarded-For header gives the client's address (polls.proxies).  List
+# a proxy on the same host here, or every client looks like 127.0.0.1.
+TRUSTED_PROXIES = config("TRUSTED_PROXIES", default="", cast=Csv())
+
+# Request metrics (polls.middleware.QueryMetricsMiddleware): requests with
+# more queries than QUERY_BUDGET are logged, and /metrics is only served to
+# clients in METRICS_ALLOWED_IPS that send METRICS_TOKEN, if it is set, as
+# a bearer token.
+QUERY_BUDGET = config("QUERY_BUDGET", default=20, cast=int)
+METRICS_ALLOWED_IPS = config("METRICS_ALLOWED_IPS", default="127.0.0.1, ::1",
+                             cast=Csv())
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+
+
+# Live results stream (polls:results_stream, served only with
+# POLLS_ASYNC_VIEWS): seconds between updates, and seconds before a client
+# has to reconnect.
+RESULTS_STREAM_INTERVAL = config("RESULTS_STREAM_INTERVAL", default=1.0,
+                                 cast=float)
+RESULTS_STREAM_TIMEOUT = config("RESULTS_STREAM_TIMEOUT", default=300,
+                                cast=int)
+
+
+# Vote rate limits (see polls/ratelimit.py): each user and each IP address
+# may vote BURST times in a row and then RATE times per second; further
+# votes get 429 Too Many Requests.  A RATE of 0 turns the limit off.  The
+# user is read from the session, which is one query with the db
+# SESSION_PROFILE and none with cached_db or signed_cookies.
+VOTE_USER_RATE = config("VOTE_USER_RATE", default=0.5, cast=float)
+VOTE_USER_BURST = config("VOTE_USER_BURST", default=10, cast=int)
+VOTE_IP_RATE = config("VOTE_IP_RATE", default=5.0, cast=float)
+VOTE_IP_BURST = config("VOTE_IP_BURST", default=50, cast=int)
+
+
+# Serve the detail, results and vote pages with the async views in
+# polls/async_views.py, and the live results stream; use with an ASGI
+# server such as uvicorn.  A WSGI server would hold a worker for each open
+# stream.
+POLLS_ASYNC_VIEWS = config("POLLS_ASYNC_VIEWS", default=False, cast=bool)
+
+
+# Buffered vote ingestion (see polls/buffer.py): queue votes in memory and
+# write them in batches every FLUSH_INTERVAL seconds or MAX_SIZE votes.
+VOTE_BUFFER_ENABLED = config("VOTE_BUFFER_ENABLED", default=False, cast=bool)
+VOTE_BUFFER_FLUSH_INTERVAL = config("VOTE_BUFFER_FLUSH_INTERVAL", default=0.5,
+                                    cast=float)
+VOTE_BUFFER_MAX_SIZE = config("VOTE_BUFFER_MAX_SIZE", default=500, cast=int)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -93,6 +244,34 @@ AUTHENTICATION_BACKENDS = [
    'django.contrib.auth.backends.ModelBackend',  
 ]
 
+# How new passwords are hashed, chosen with PASSWORD_HASHER:
+# - pbkdf2: Django's default, PBKDF2 with 600000 iterations;
+# - scrypt: scrypt with a work factor of SCRYPT_WORK_FACTOR;
+# - argon2: Argon2id with ARGON2_TIME_COST passes over ARGON2_MEMORY_COST
+#   KiB (needs the argon2-cffi package).
+# Every profile still checks hashes made by the others, and a password is
+# rehashed with the current choice the next time its user logs in.
+DEFAULT_PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+PASSWORD_HASHER_PROFILES = {
+    'pbkdf2': DEFAULT_PASSWORD_HASHERS,
+    'scrypt': ['mysite.hashers.TunedScryptPasswordHasher',
+               *DEFAULT_PASSWORD_HASHERS],
+    'argon2': ['mysite.hashers.TunedArgon2PasswordHasher',
+               *DEFAULT_PASSWORD_HASHERS],
+}
+PASSWORD_HASHER = config("PASSWORD_HASHER", default="pbkdf2",
+                         cast=Choices(list(PASSWORD_HASHER_PROFILES)))
+PASSWORD_HASHERS = PASSWORD_HASHER_PROFILES[PASSWORD_HASHER]
+SCRYPT_WORK_FACTOR = config("SCRYPT_WORK_FACTOR", default=2 ** 14, cast=int)
+ARGON2_TIME_COST = config("ARGON2_TIME_COST", default=2, cast=int)
+ARGON2_MEMORY_COST = config("ARGON2_MEMORY_COST", default=19456, cast=int)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -0,0 +1,20 @@
+"""
+SQLite database backend that starts transactions with BEGIN IMMEDIATE.
+
+With the default deferred BEGIN, a transaction that reads before it writes
+(like saving a vote) only asks for the write lock at its first write, and
+SQLite then fails at once with "database is locked" if another connection
+is writing, without waiting for the busy timeout.  Taking the write lock
+when the transaction begins makes concurrent writers wait their turn.
+
+Every atomic() block takes the write lock, including ones that only read,
+so this backend is used only with SQLITE_PRODUCTION (see mysite/settings.py).
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def _start_transaction_under_autocommit(self):
+        # called by atomic() to begin a transaction, in place of the
+        # deferred BEGIN of the sqlite3 module
+        self.cursor().execute("BEGIN IMMEDIATE")
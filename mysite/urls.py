@@ -14,16 +14,22 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import include, path
 from django.views.generic import RedirectView
 
+from polls.views import metrics
 from . import views
 
+# the async views only pay off under an ASGI server
+polls_urls = "polls.async_urls" if settings.POLLS_ASYNC_VIEWS else "polls.urls"
+
 urlpatterns = [
-    path("polls/", include("polls.urls")),
+    path("polls/", include(polls_urls)),
     path('accounts/', include('django.contrib.auth.urls')),
     path('signup/', views.signup, name='signup'),
     path('admin/', admin.site.urls),
+    path('metrics', metrics, name='metrics'),
     path("", RedirectView.as_view(url="polls/")),
 ]
@@ -1,5 +1,5 @@
 from django.shortcuts import render, redirect
-from django.contrib.auth import login, authenticate
+from django.contrib.auth import login
 from django.contrib.auth.forms import UserCreationForm
 
 
@@ -8,14 +8,11 @@ def signup(request):
     if request.method == 'POST':
         form = UserCreationForm(request.POST)
         if form.is_valid():
-            # save the new user
-            form.save()
-            # get named fields from the form data
-            username = form.cleaned_data.get('username')
-            # password input field is named 'password1'
-            raw_password = form.cleaned_data.get('password1')
-            user = authenticate(username=username, password=raw_password)
-            login(request, user)
+            # save the new user and log them in; authenticate() would
+            # hash the password a second time
+            user = form.save()
+            login(request, user,
+                  backend='django.contrib.auth.backends.ModelBackend')
             # redirect to home page
             return redirect('polls:index')
     else:
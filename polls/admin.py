@@ -1,6 +1,84 @@
 from django.contrib import admin
-from .models import Question, Choice
+from django.core.paginator import Paginator
+from django.db.models import Max, Sum
+from django.utils.functional import cached_property
+from .models import Question, Choice, Vote
+from .voting import delete_votes
 
 
-admin.site.register(Question)
-admin.site.register(Choice)
+class EstimatedCountPaginator(Paginator):
+    """
+    Estimates the count of an unfiltered queryset from its largest id,
+    instead of a COUNT(*) that reads the whole table.  The estimate is too
+    high by the number of deleted rows, so the last pages may be short or
+    empty.  Filtered querysets are counted exactly.
+    """
+    @cached_property
+    def count(self):
+        if self.object_list.query.where:
+            return super().count
+        return self.object_list.aggregate(last=Max("pk"))["last"] or 0
+
+
+class ChoiceInline(admin.TabularInline):
+    """Edit the choices of a question on the question's page."""
+    model = Choice
+    extra = 3
+    fields = ["choice_text", "vote_count"]
+    # maintained by polls.voting
+    readonly_fields = ["vote_count"]
+
+
+@admin.register(Question)
+class QuestionAdmin(admin.ModelAdmin):
+    inlines = [ChoiceInline]
+    list_display = ["question_text", "pub_date", "end_date", "total_votes"]
+    search_fields = ["question_text"]
+    date_hierarchy = "pub_date"
+
+    def get_queryset(self, request):
+        # the sum of the vote counters of the choices, not a COUNT of votes
+        return super().get_queryset(request).annotate(
+            total_votes=Sum("choice__vote_count"))
+
+    @admin.display(ordering="total_votes")
+    def total_votes(self, question):
+        return question.total_votes or 0
+
+
+@admin.register(Choice)
+class ChoiceAdmin(admin.ModelAdmin):
+    list_display = ["choice_text", "question", "vote_count"]
+    list_select_related = ["question"]
+    raw_id_fields = ["question"]
+    readonly_fields = ["vote_count"]
+    search_fields = ["choice_text"]
+
+
+@admin.register(Vote)
+class VoteAdmin(admin.ModelAdmin):
+    """
+    Lists votes read-only: adding or changing a vote here would skip the
+    vote counters, the event log and the rollups that polls.voting keeps.
+    Deleting votes goes through polls.voting.delete_votes(), which
+    updates them.
+    """
+    list_display = ["id", "user", "question", "choice", "voted_at"]
+    list_select_related = ["user", "question", "choice"]
+    raw_id_fields = ["user", "question", "choice"]
+    search_fields = ["user__username"]
+    paginator = EstimatedCountPaginator
+    # skip the second COUNT(*) behind "N total"
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def delete_model(self, request, obj):
+        delete_votes(Vote.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        delete_votes(queryset)
@@ -0,0 +1,18 @@
+from django.urls import path
+
+from . import async_views, views
+
+app_name = "polls"
+urlpatterns = [
+    path("", views.IndexView.as_view(), name="index"),
+    path("<int:pk>/", async_views.DetailView.as_view(), name="detail"),
+    path("<int:pk>/results/", async_views.ResultsView.as_view(),
+         name="results"),
+    path("<int:pk>/results/stream/", views.results_stream,
+         name="results_stream"),
+    path("<int:pk>/results/history.json", views.results_history,
+         name="results_history"),
+    path("<int:question_id>/vote/", async_views.vote, name="vote"),
+    path("<int:pk>/export/", views.export, name="export"),
+    path("bulk/", views.bulk_create_questions, name="bulk_create_questions"),
+]
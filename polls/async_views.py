@@ -0,0 +1,126 @@
+"""
+Async versions of the detail, results and vote views, used instead of
+the sync ones when POLLS_ASYNC_VIEWS is set (see polls/async_urls.py).
+
+Under an ASGI server a sync view runs in a worker thread; these views run
+on the event loop and read the database with the async ORM.  Loading the
+user and session and saving a vote still need a thread: the lazy user and
+the session backends are sync, and the async ORM has no transactions.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404
+from django.shortcuts import redirect, render
+
+from . import views
+from .buffer import get_vote_buffer
+from .cache import aget_version, apeek_version
+from .models import Choice, Question, Vote
+from .ratelimit import limit_votes
+from .views import aget_user, vote_saved
+from .voting import (aget_session_vote, aremember_vote, cast_vote,
+                     forget_votes)
+
+
+class DetailView(views.DetailView):
+    """Async version of polls.views.DetailView."""
+
+    async def get(self, request, *args, **kwargs):
+        """
+        Returns the detail page for a question.
+        """
+        user = await aget_user(request)
+        try:
+            question = await Question.objects.with_is_open().aget(
+                pk=kwargs["pk"])
+        except Question.DoesNotExist:
+            messages.error(request, "This question does not exist.")
+            return redirect("polls:index")
+        if not question.is_open:
+            messages.error(request, "This page doesn't allow voting.")
+            return redirect("polls:index")
+        # the template must not query, so load the choices here
+        choices = [choice async for choice in question.choice_set.all()]
+        choice_voted = None
+        if user.is_authenticated:
+            choice_voted = await aget_session_vote(request, user, question.id)
+
+        return render(request, self.template_name,
+                      {"question": question, "choices": choices,
+                       "choice_voted": choice_voted})
+
+
+class ResultsView(views.ResultsView):
+    """Async version of polls.views.ResultsView."""
+
+    async def aget_fragment_key(self):
+        """Async version of ResultsView.get_fragment_key()."""
+        pk = self.kwargs["pk"]
+        if await apeek_version(f"results:{pk}") is None \
+                and not await Question.objects.filter(pk=pk).aexists():
+            raise Http404("No question matches the given query.")
+        return self.format_fragment_key(
+            pk, await aget_version(f"results:{pk}"))
+
+    async def aget_fragment_context(self):
+        """Async version of ResultsView.get_fragment_context()."""
+        try:
+            question = await Question.objects.select_related(
+                "snapshot").aget(pk=self.kwargs["pk"])
+        except Question.DoesNotExist:
+            raise Http404("No question matches the given query.")
+        choices = await question.aresults()
+        total_votes = choices[0].total_votes if choices else 0
+        return {"question": question, "choices": choices,
+                "total_votes": total_votes}
+
+    async def get(self, request, *args, **kwargs):
+        """
+        Returns the results page for a question.
+        """
+        return await self.arender_page(
+            {"question_id": kwargs["pk"],
+             "live_results": settings.POLLS_ASYNC_VIEWS})
+
+
+@limit_votes
+async def vote(request, question_id):
+    """
+    Async version of polls.views.vote.
+    """
+    user = await aget_user(request)
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+    try:
+        question = await Question.objects.with_is_open().aget(pk=question_id)
+    except Question.DoesNotExist:
+        messages.error(request, "This question does not exist.")
+        return redirect("polls:index")
+
+    if not question.is_open:
+        messages.error(request, "This question page not allow voting.")
+        return redirect("polls:index")
+    try:
+        selected_choice = await question.choice_set.aget(
+            pk=request.POST["choice"])
+    except (KeyError, Choice.DoesNotExist):
+        messages.error(request, "You didn't select a choice.")
+        return redirect("polls:detail", question_id)
+    if not settings.VOTE_BUFFER_ENABLED and await Vote.objects.filter(
+            user=user, question=question,
+            choice=selected_choice).aexists():
+        # a repeated submit of the saved choice; there is nothing to write
+        await aremember_vote(request, user, question.id, selected_choice.id)
+        return vote_saved(request, question)
+    if settings.VOTE_BUFFER_ENABLED:
+        # queue the vote; the session reloads the votes once it is written
+        get_vote_buffer().add(user.pk, question.pk, selected_choice.pk)
+        forget_votes(request)
+        return vote_saved(request, question, queued=True)
+    # cast_vote() needs a transaction, which the async ORM lacks
+    await sync_to_async(cast_vote)(user, selected_choice)
+    await aremember_vote(request, user, question.id, selected_choice.id)
+
+    return vote_saved(request, question)
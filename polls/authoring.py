@@ -0,0 +1,78 @@
+"""
+Bulk authoring of questions with their choices.
+
+create_questions() validates every question and choice first and then
+writes them in one transaction with one bulk_create() per model, instead
+of a save() (and its own transaction) per object.
+"""
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .cache import bump_version
+from .models import Choice, Question
+
+QUESTION_FIELDS = ("question_text", "pub_date", "end_date")
+
+
+def parse_questions(items):
+    """
+    Return unsaved (question, [choices]) pairs for a list of objects like
+    {"question_text": ..., "pub_date": ..., "end_date": ...,
+    "choices": ["choice text", ...]}.  Only question_text is required.
+    Raises ValidationError with the errors of each invalid item under its
+    index.
+    """
+    if not isinstance(items, list):
+        raise ValidationError("Expected a list of questions.")
+    parsed = []
+    errors = {}
+    for index, item in enumerate(items):
+        try:
+            parsed.append(_parse_question(item))
+        except ValidationError as error:
+            errors[str(index)] = error.messages
+    if errors:
+        raise ValidationError(errors)
+    return parsed
+
+
+def _parse_question(item):
+    if not isinstance(item, dict):
+        raise ValidationError("Expected an object.")
+    unknown = set(item) - set(QUESTION_FIELDS) - {"choices"}
+    if unknown:
+        raise ValidationError(
+            "Unknown fields: {}.".format(", ".join(sorted(unknown))))
+    question = Question(**{name: item[name] for name in QUESTION_FIELDS
+                           if name in item})
+    question.full_clean()
+    choice_texts = item.get("choices", [])
+    if not isinstance(choice_texts, list):
+        raise ValidationError("choices must be a list of strings.")
+    choices = []
+    for text in choice_texts:
+        choice = Choice(choice_text=text)
+        # the question is checked above and has no id yet
+        choice.full_clean(exclude=["question"])
+        choices.append(choice)
+    return question, choices
+
+
+def create_questions(items, batch_size=1000):
+    """
+    Validate and save questions with their choices (see parse_questions())
+    in one transaction.  Returns the saved (question, [choices]) pairs.
+    """
+    parsed = parse_questions(items)
+    with transaction.atomic():
+        Question.objects.bulk_create([question for question, _ in parsed],
+                                     batch_size=batch_size)
+        for question, choices in parsed:
+            for choice in choices:
+                choice.question = question
+        Choice.objects.bulk_create(
+            [choice for _, choices in parsed for choice in choices],
+            batch_size=batch_size)
+        # bulk_create sends no post_save to invalidate the index page
+        transaction.on_commit(lambda: bump_version("questions"))
+    return parsed
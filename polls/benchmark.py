@@ -0,0 +1,309 @@
+"""
+Helpers for the benchmark management commands.
+
+The benchmarks run against a throw-away database, seed it with generated
+polls and measure request latency, throughput and the number of queries
+per request.  Results can be saved as a JSON baseline and later runs
+compared with it.
+
+run_http_load() instead sends real HTTP requests over keep-alive
+connections to a running server, such as uvicorn, to compare the sync
+and async views under ASGI.
+"""
+import asyncio
+import contextlib
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, connections
+from django.test.utils import (setup_test_environment,
+                               teardown_test_environment)
+
+from .models import Choice, Question
+from .voting import apply_votes
+
+WRITE_STATEMENTS = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+
+@contextlib.contextmanager
+def benchmark_database():
+    """
+    Run the body against a new database in a temporary file, so that the
+    benchmark can use several threads and never touches real data.
+    """
+    handle, path = tempfile.mkstemp(suffix=".sqlite3")
+    os.close(handle)
+    connection.settings_dict["TEST"]["NAME"] = path
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0,
+                                                  autoclobber=True)
+    try:
+        yield
+    finally:
+        connections.close_all()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+        for suffix in ("", "-wal", "-shm"):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path + suffix)
+
+
+def seed(questions, choices, users, votes_per_user, batch_size=5000):
+    """
+    Create open questions with choices and users who vote on random
+    questions.  Returns (question ids, {question id: choice ids}, user ids).
+    """
+    Question.objects.bulk_create(
+        Question(question_text=f"Benchmark question {n}")
+        for n in range(questions))
+    question_ids = list(Question.objects.values_list("id", flat=True))
+    Choice.objects.bulk_create(
+        Choice(question_id=question_id, choice_text=f"Choice {n}")
+        for question_id in question_ids for n in range(choices))
+    choice_ids = {}
+    for question_id, choice_id in Choice.objects.values_list("question_id",
+                                                             "id"):
+        choice_ids.setdefault(question_id, []).append(choice_id)
+    # hash once; users only log in with force_login
+    password = make_password(None)
+    User.objects.bulk_create(
+        (User(username=f"bench{n}", password=password) for n in range(users)),
+        batch_size=batch_size)
+    user_ids = list(User.objects.values_list("id", flat=True))
+    batch = {}
+    for user_id in user_ids:
+        for question_id in random.sample(
+                question_ids, min(votes_per_user, len(question_ids))):
+            batch[(user_id, question_id)] = random.choice(
+                choice_ids[question_id])
+        if len(batch) >= batch_size:
+            apply_votes(batch)
+            batch = {}
+    if batch:
+        apply_votes(batch)
+    return question_ids, choice_ids, user_ids
+
+
+class QueryCounter:
+    """Counts the queries and writes run on the current thread's connection."""
+
+    def __init__(self):
+        self.queries = 0
+        self.writes = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        if sql.lstrip().upper().startswith(WRITE_STATEMENTS):
+            self.writes += 1
+        return execute(sql, params, many, context)
+
+
+def percentile(values, fraction):
+    """Return the value below which `fraction` of the sorted values fall."""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(fraction * (len(values) - 1))))
+    return values[index]
+
+
+def run_load(make_request, requests, threads):
+    """
+    Call make_request(worker, n) `requests` times spread over `threads`
+    threads; worker is the thread number.  Returns the statistics.
+    """
+    latencies = []
+    counters = []
+    errors = []
+    lock = threading.Lock()
+
+    def worker(number):
+        counter = QueryCounter()
+        times = []
+        try:
+            with connection.execute_wrapper(counter):
+                for n in range(number, requests, threads):
+                    started = time.perf_counter()
+                    make_request(number, n)
+                    times.append(time.perf_counter() - started)
+        except Exception as error:
+            errors.append(error)
+        finally:
+            connection.close()
+        with lock:
+            latencies.extend(times)
+            counters.append(counter)
+
+    pool = [threading.Thread(target=worker, args=(number,))
+            for number in range(threads)]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    if errors:
+        raise errors[0]
+    count = len(latencies) or 1
+    stats = latency_stats(latencies, elapsed)
+    stats["queries_per_request"] = sum(c.queries for c in counters) / count
+    stats["writes_per_request"] = sum(c.writes for c in counters) / count
+    return stats
+
+
+def latency_stats(latencies, elapsed):
+    """Return the request count, throughput and latency percentiles."""
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+class HTTPConnection:
+    """
+    A minimal HTTP/1.1 client connection that stays open between requests
+    and reconnects when the server closes it.
+    """
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, headers=(), body=b""):
+        """Send a request; return (status, headers) after reading the body."""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(
+                self.host, self.port)
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}",
+                 f"Content-Length: {len(body)}"]
+        lines.extend(f"{name}: {value}" for name, value in headers)
+        self.writer.write("\r\n".join(lines).encode() + b"\r\n\r\n" + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("The server closed the connection.")
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+        if "chunked" in response_headers.get("transfer-encoding", ""):
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                # the chunk and its CRLF; the last chunk is empty
+                await self.reader.readexactly(size + 2)
+                if not size:
+                    break
+        else:
+            await self.reader.readexactly(
+                int(response_headers.get("content-length", 0)))
+        if response_headers.get("connection", "").lower() == "close":
+            self.close()
+        return status, response_headers
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+
+def run_http_load(url, make_request, requests, connections):
+    """
+    Send `requests` requests to the server at `url` over `connections`
+    concurrent keep-alive connections.  make_request(worker, n) returns
+    (method, path, headers, body); redirects are followed with a GET and
+    timed as part of the request.  Returns the statistics.
+    """
+    return asyncio.run(_http_load(url, make_request, requests, connections))
+
+
+async def _http_load(url, make_request, requests, connections):
+    parts = urlsplit(url)
+    latencies = []
+
+    async def worker(number):
+        connection = HTTPConnection(parts.hostname, parts.port or 80)
+        try:
+            for n in range(number, requests, connections):
+                method, path, headers, body = make_request(number, n)
+                started = time.perf_counter()
+                status, response_headers = await connection.request(
+                    method, path, headers, body)
+                while 300 <= status < 400:
+                    path = urlsplit(response_headers["location"]).path
+                    status, response_headers = await connection.request(
+                        "GET", path, headers)
+                latencies.append(time.perf_counter() - started)
+                if status >= 400:
+                    raise RuntimeError(f"{method} {path} returned {status}")
+        finally:
+            connection.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(number) for number in range(connections)))
+    return latency_stats(latencies, time.perf_counter() - started)
+
+
+def save_results(path, results):
+    """Write benchmark results as a JSON baseline."""
+    with open(path, "w") as file:
+        json.dump(results, file, indent=2, sort_keys=True)
+
+
+def compare_results(baseline, results, tolerance):
+    """
+    Return a list of regressions of `results` against `baseline`.  Latency
+    may grow and throughput may drop by `tolerance` (a fraction); query
+    and write counts must not grow at all.
+    """
+    regressions = []
+    for name, old in baseline.get("scenarios", {}).items():
+        new = results.get("scenarios", {}).get(name)
+        if new is None:
+            continue
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            if new[key] > old[key] * (1 + tolerance):
+                regressions.append(
+                    f"{name}: {key} {new[key]:.2f} > {old[key]:.2f}")
+        if new["throughput"] < old["throughput"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {new['throughput']:.1f}"
+                               f" < {old['throughput']:.1f}")
+        for key in ("queries_per_request", "writes_per_request"):
+            # not measured by run_http_load()
+            if key not in old or key not in new:
+                continue
+            if new[key] > old[key] + 1e-9:
+                regressions.append(
+                    f"{name}: {key} {new[key]:.2f} > {old[key]:.2f}")
+    return regressions
+
+
+def format_table(scenarios):
+    """Return the results of each scenario as lines of a text table."""
+    lines = [f"{'scenario':<16}{'reqs':>7}{'req/s':>9}{'p50 ms':>9}"
+             f"{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}{'writes':>8}"]
+    for name, stats in scenarios.items():
+        queries = stats.get("queries_per_request")
+        writes = stats.get("writes_per_request")
+        lines.append(
+            f"{name:<16}{stats['requests']:>7}{stats['throughput']:>9.1f}"
+            f"{stats['p50_ms']:>9.2f}{stats['p95_ms']:>9.2f}"
+            f"{stats['p99_ms']:>9.2f}"
+            + (f"{queries:>9.2f}" if queries is not None else f"{'-':>9}")
+            + (f"{writes:>8.2f}" if writes is not None else f"{'-':>8}"))
+    return lines
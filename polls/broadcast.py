@@ -0,0 +1,63 @@
+"""
+In-process publish/subscribe of vote count changes for live results.
+
+apply_votes() publishes the questions whose counts changed.  Subscribers
+(the results event streams) poll the version of their question once per
+interval; when it moved, the first subscriber to notice loads the counts
+with one query and every other subscriber reuses them.  So a burst of
+votes costs at most one query per question per interval, however many
+clients are watching.
+
+Only votes handled by this process are seen, so with several worker
+processes a stream lags until a vote reaches its own process.
+"""
+import asyncio
+import threading
+
+from .models import Choice
+
+
+class ResultsBroadcaster:
+    """Tracks a version per question and caches its latest vote counts."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # question_id -> number of publishes so far
+        self._versions = {}
+        # question_id -> (version, {choice_id: vote_count})
+        self._counts = {}
+        # question_id -> asyncio.Lock serializing the reload of its counts
+        self._loading = {}
+
+    def publish(self, question_ids):
+        """Mark the vote counts of the questions as changed."""
+        with self._lock:
+            for question_id in question_ids:
+                self._versions[question_id] = \
+                    self._versions.get(question_id, 0) + 1
+
+    def version(self, question_id):
+        """Return the current version of a question's vote counts."""
+        return self._versions.get(question_id, 0)
+
+    async def get_counts(self, question_id):
+        """
+        Return (version, {choice_id: vote_count}) for a question, querying
+        the database only if the counts changed since the last load.
+        """
+        version = self.version(question_id)
+        cached = self._counts.get(question_id)
+        if cached is not None and cached[0] == version:
+            return cached
+        lock = self._loading.setdefault(question_id, asyncio.Lock())
+        async with lock:
+            cached = self._counts.get(question_id)
+            if cached is None or cached[0] != version:
+                choices = Choice.objects.filter(question_id=question_id) \
+                    .values_list("id", "vote_count")
+                cached = (version, {pk: n async for pk, n in choices})
+                self._counts[question_id] = cached
+        return cached
+
+
+broadcaster = ResultsBroadcaster()
@@ -0,0 +1,124 @@
+"""
+Write-behind buffering of votes.
+
+When VOTE_BUFFER_ENABLED is set, the vote view queues votes here instead
+of writing them immediately.  A background thread writes the queue with
+apply_votes() every VOTE_BUFFER_FLUSH_INTERVAL seconds, or sooner once
+VOTE_BUFFER_MAX_SIZE different (user, question) pairs are waiting.  Only
+the latest vote of each user on a question is kept, so a burst of votes
+costs one transaction per flush instead of one per request.
+"""
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, connection
+
+from .voting import apply_votes
+
+logger = logging.getLogger(__name__)
+
+
+class VoteBuffer:
+    """An in-process queue of votes that is flushed in batches."""
+
+    def __init__(self, interval=None, max_size=None, background=True):
+        self.interval = (settings.VOTE_BUFFER_FLUSH_INTERVAL
+                         if interval is None else interval)
+        self.max_size = (settings.VOTE_BUFFER_MAX_SIZE
+                         if max_size is None else max_size)
+        self.background = background
+        # (user_id, question_id) -> choice_id of the latest vote
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending)
+
+    def add(self, user_id, question_id, choice_id):
+        """Queue a vote, replacing any queued vote for the same question."""
+        with self._lock:
+            self._pending[(user_id, question_id)] = choice_id
+            full = len(self._pending) >= self.max_size
+            if self.background and self._thread is None:
+                self._start()
+        if full:
+            if self.background:
+                self._wakeup.set()
+            else:
+                self.flush()
+
+    def flush(self):
+        """Write all queued votes.  Returns the number of votes written."""
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return 0
+        try:
+            apply_votes(batch)
+        except IntegrityError:
+            # a user or choice was deleted since the vote was queued;
+            # write the votes one by one so only the broken ones are lost
+            for key, choice_id in batch.items():
+                try:
+                    apply_votes({key: choice_id})
+                except IntegrityError:
+                    logger.warning("Dropped buffered vote %s -> %s",
+                                   key, choice_id)
+        except Exception:
+            # keep the batch for the next flush, without overwriting
+            # votes that were queued in the meantime
+            with self._lock:
+                for key, choice_id in batch.items():
+                    self._pending.setdefault(key, choice_id)
+            raise
+        return len(batch)
+
+    def drain(self):
+        """Stop the background thread and write everything still queued."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            self._stopping = True
+        if thread is not None:
+            self._wakeup.set()
+            thread.join()
+        self.flush()
+        self._stopping = False
+
+    def _start(self):
+        """Start the flusher thread.  Called with the lock held."""
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name="vote-buffer")
+        self._thread.start()
+
+    def _run(self):
+        """Flush the queue periodically until drain() is called."""
+        try:
+            while not self._stopping:
+                self._wakeup.wait(self.interval)
+                self._wakeup.clear()
+                try:
+                    self.flush()
+                except Exception:
+                    logger.exception("Could not flush buffered votes")
+        finally:
+            connection.close()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_vote_buffer():
+    """Return the process-wide vote buffer, creating it on first use."""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = VoteBuffer()
+            atexit.register(_buffer.drain)
+        return _buffer
@@ -0,0 +1,45 @@
+"""Version stamps used to build cache keys for rendered polls pages."""
+import time
+
+from django.core.cache import cache
+
+
+def _version_key(name):
+    return f"polls:version:{name}"
+
+
+def get_version(name):
+    """
+    Return the current version stamp of `name`.  The stamp is the time in
+    nanoseconds of the last bump_version(name), or of the first call after
+    the stamp was evicted from the cache.
+    """
+    version = cache.get(_version_key(name))
+    if version is None:
+        cache.add(_version_key(name), time.time_ns(), None)
+        version = cache.get(_version_key(name))
+    return version
+
+
+async def aget_version(name):
+    """Async version of get_version()."""
+    version = await cache.aget(_version_key(name))
+    if version is None:
+        await cache.aadd(_version_key(name), time.time_ns(), None)
+        version = await cache.aget(_version_key(name))
+    return version
+
+
+def peek_version(name):
+    """Return the current version stamp of `name`, or None if it has none."""
+    return cache.get(_version_key(name))
+
+
+async def apeek_version(name):
+    """Async version of peek_version()."""
+    return await cache.aget(_version_key(name))
+
+
+def bump_version(name):
+    """Give `name` a new version stamp, invalidating keys built on it."""
+    cache.set(_version_key(name), time.time_ns(), None)
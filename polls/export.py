@@ -0,0 +1,86 @@
+"""
+Streaming export of poll results and votes as CSV or JSON Lines.
+
+Every exporter yields one dict per row, reading the database with
+QuerySet.iterator() so that memory use does not depend on the number of
+rows.  format_rows() turns the dicts into lines of text.
+"""
+import csv
+import json
+
+from django.db.models import F, Sum, Window
+
+from .models import Choice, Vote
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+}
+CHUNK_SIZE = 2000
+
+
+def question_results(question):
+    """Yield the vote count and percentage of each choice of a question."""
+    for choice in question.results():
+        yield {
+            "choice_id": choice.id,
+            "choice_text": choice.choice_text,
+            "votes": choice.vote_count,
+            "percentage": round(choice.percentage, 2),
+        }
+
+
+def question_votes(question):
+    """Yield every vote on a question."""
+    votes = Vote.objects.filter(question=question).order_by("id") \
+        .values("id", "user__username", "choice_id", "choice__choice_text")
+    for vote in votes.iterator(chunk_size=CHUNK_SIZE):
+        yield {
+            "vote_id": vote["id"],
+            "username": vote["user__username"],
+            "choice_id": vote["choice_id"],
+            "choice_text": vote["choice__choice_text"],
+        }
+
+
+def all_results():
+    """
+    Yield the vote count of every choice of every question, with the
+    question's total, from a single query.
+    """
+    choices = Choice.objects.order_by("question_id", "id").values(
+        "question_id", "choice_text", "vote_count",
+        choice_id=F("id"),
+        question_text=F("question__question_text"),
+        question_votes=Window(Sum("vote_count"),
+                              partition_by=F("question_id")),
+    )
+    for choice in choices.iterator(chunk_size=CHUNK_SIZE):
+        yield {
+            "question_id": choice["question_id"],
+            "question_text": choice["question_text"],
+            "choice_id": choice["choice_id"],
+            "choice_text": choice["choice_text"],
+            "votes": choice["vote_count"],
+            "question_votes": choice["question_votes"],
+        }
+
+
+class _Echo:
+    """A file-like object whose write() returns what it was given."""
+    def write(self, value):
+        return value
+
+
+def format_rows(rows, export_format):
+    """Yield the rows as lines of CSV (with a header) or JSON Lines."""
+    if export_format == "jsonl":
+        for row in rows:
+            yield json.dumps(row) + "\n"
+        return
+    writer = None
+    for row in rows:
+        if writer is None:
+            writer = csv.DictWriter(_Echo(), fieldnames=list(row))
+            yield writer.writeheader()
+        yield writer.writerow(row)
@@ -0,0 +1,229 @@
+"""
+How the vote counts of a question evolved, from the vote event log.
+
+Every vote change appends a VoteEvent.  compact_events() folds the events
+older than a cutoff into VoteCheckpoints, one per choice at the end of
+each period that had events, and deletes them.  vote_history() then
+rebuilds the counts at any time from the last checkpoint before it plus
+the short tail of events that are not compacted yet.
+
+For trend charts, every vote also adds to VoteRollups, the net change of
+each choice's count per minute, hour and day; rollup_history() reads only
+those, however many votes there are.
+
+Periods are counted in UTC from the Unix epoch.
+"""
+import datetime
+import functools
+import operator
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F, Max, Q
+
+from .models import Choice, VoteCheckpoint, VoteEvent, VoteRollup
+
+PERIODS = {
+    "hour": datetime.timedelta(hours=1),
+    "day": datetime.timedelta(days=1),
+}
+BUCKETS = {"minute": datetime.timedelta(minutes=1), **PERIODS}
+
+
+def period_start(moment, period):
+    """Return the start of the period (a timedelta) containing `moment`."""
+    seconds = period.total_seconds()
+    return datetime.datetime.fromtimestamp(
+        moment.timestamp() // seconds * seconds, tz=datetime.timezone.utc)
+
+
+def _apply(counts, event):
+    if event.old_choice_id is not None:
+        counts[event.old_choice_id] -= 1
+    if event.new_choice_id is not None:
+        counts[event.new_choice_id] += 1
+
+
+def _last_checkpoint(question_id, before):
+    """Return (time, Counter of votes) of the last checkpoint <= before."""
+    at = VoteCheckpoint.objects.filter(
+        question_id=question_id, at__lte=before).aggregate(at=Max("at"))["at"]
+    if at is None:
+        return None, Counter()
+    return at, Counter(dict(VoteCheckpoint.objects.filter(
+        question_id=question_id, at=at).values_list("choice_id",
+                                                    "vote_count")))
+
+
+def compact_events(cutoff, period):
+    """
+    Fold the events before `cutoff` (rounded down to a whole period) into
+    checkpoints, one question per transaction.  Returns the number of
+    events folded.
+    """
+    cutoff = period_start(cutoff, period)
+    question_ids = VoteEvent.objects.filter(timestamp__lt=cutoff) \
+        .values_list("question_id", flat=True).distinct()
+    folded = 0
+    for question_id in list(question_ids):
+        with transaction.atomic():
+            folded += _compact_question(question_id, cutoff, period)
+    return folded
+
+
+def _compact_question(question_id, cutoff, period):
+    at, counts = _last_checkpoint(question_id, cutoff)
+    events = VoteEvent.objects.filter(question_id=question_id,
+                                      timestamp__lt=cutoff)
+    checkpoints = []
+    period_end = None
+
+    def checkpoint():
+        checkpoints.extend(
+            VoteCheckpoint(question_id=question_id, choice_id=choice_id,
+                           at=period_end, vote_count=count)
+            for choice_id, count in counts.items())
+
+    folded = 0
+    later = events if at is None else events.filter(timestamp__gte=at)
+    for event in later.order_by("timestamp", "id").iterator():
+        end = period_start(event.timestamp, period) + period
+        if period_end is not None and end != period_end:
+            checkpoint()
+        period_end = end
+        _apply(counts, event)
+        folded += 1
+    if period_end is not None:
+        checkpoint()
+    VoteCheckpoint.objects.bulk_create(checkpoints)
+    events.delete()
+    return folded
+
+
+def vote_history(question, times):
+    """
+    Return [(time, {choice_id: votes}), ...] with the vote counts of the
+    question at each of the times, in order.
+    """
+    times = sorted(times)
+    if not times:
+        return []
+    at, counts = _last_checkpoint(question.pk, times[0])
+    later_checkpoints = VoteCheckpoint.objects.filter(
+        question=question, at__lte=times[-1])
+    events = VoteEvent.objects.filter(question=question,
+                                      timestamp__lte=times[-1])
+    if at is not None:
+        later_checkpoints = later_checkpoints.filter(at__gt=at)
+        events = events.filter(timestamp__gte=at)
+    # a checkpoint replaces the counts of the events before it
+    steps = [(checkpoint.at, 0, checkpoint)
+             for checkpoint in later_checkpoints.order_by("at")]
+    last_at = steps[-1][0] if steps else at
+    if last_at is not None:
+        events = events.filter(timestamp__gte=last_at)
+    steps.extend((event.timestamp, 1, event)
+                 for event in events.order_by("timestamp", "id"))
+    steps.sort(key=lambda step: (step[0], step[1]))
+
+    history = []
+    index = 0
+    replaced_at = at
+    for moment in times:
+        while index < len(steps) and steps[index][0] <= moment:
+            when, kind, item = steps[index]
+            if kind == 0:
+                if when != replaced_at:
+                    counts = Counter()
+                    replaced_at = when
+                counts[item.choice_id] = item.vote_count
+            else:
+                _apply(counts, item)
+            index += 1
+        history.append((moment, {choice_id: count
+                                 for choice_id, count in counts.items()
+                                 if count}))
+    return history
+
+
+def add_to_rollups(deltas, question_ids, now):
+    """
+    Add the vote count changes `deltas` ({choice_id: votes}) at `now` to
+    the minute, hour and day rollups of the choices.  `question_ids` maps
+    each choice id to its question id.  Call it in the transaction that
+    changes the votes.
+    """
+    starts = {bucket: period_start(now, length)
+              for bucket, length in BUCKETS.items()}
+    in_buckets = functools.reduce(operator.or_, (
+        Q(bucket=bucket, start=start) for bucket, start in starts.items()))
+    for choice_id, amount in deltas.items():
+        if not amount:
+            continue
+        rollups = VoteRollup.objects.filter(in_buckets, choice_id=choice_id)
+        # one UPDATE, unless this is the choice's first vote in a bucket
+        if rollups.update(votes=F("votes") + amount) == len(starts):
+            continue
+        existing = set(rollups.values_list("bucket", flat=True))
+        VoteRollup.objects.bulk_create(
+            VoteRollup(question_id=question_ids[choice_id],
+                       choice_id=choice_id, bucket=bucket, start=start,
+                       votes=amount)
+            for bucket, start in starts.items() if bucket not in existing)
+
+
+def add_votes_to_rollups(votes):
+    """
+    Add many new votes, an iterable of (question_id, choice_id, voted_at),
+    to the rollups of the minute, hour and day each was cast in.  The
+    votes are summed per rollup first, so every rollup is written once:
+    one bulk_update of those that exist and one bulk_create of the rest.
+    """
+    deltas = Counter()
+    question_ids = {}
+    for question_id, choice_id, voted_at in votes:
+        question_ids[choice_id] = question_id
+        for bucket, length in BUCKETS.items():
+            deltas[(choice_id, bucket, period_start(voted_at, length))] += 1
+    if not deltas:
+        return
+    starts = {start for _, _, start in deltas}
+    existing = []
+    for rollup in VoteRollup.objects.filter(choice_id__in=question_ids,
+                                            start__in=starts):
+        key = (rollup.choice_id, rollup.bucket, rollup.start)
+        if key in deltas:
+            rollup.votes += deltas.pop(key)
+            existing.append(rollup)
+    VoteRollup.objects.bulk_update(existing, ["votes"])
+    VoteRollup.objects.bulk_create(
+        VoteRollup(question_id=question_ids[choice_id], choice_id=choice_id,
+                   bucket=bucket, start=start, votes=votes)
+        for (choice_id, bucket, start), votes in deltas.items())
+
+
+def rollup_history(question, bucket, limit):
+    """
+    Return the last `limit` buckets with votes of the question as
+    [(start, {choice_id: change}, {choice_id: votes at the end}), ...].
+    The totals are counted back from the current vote counts, so older
+    rollups may be deleted.
+    """
+    rollups = VoteRollup.objects.filter(question=question, bucket=bucket)
+    starts = list(rollups.order_by("-start").values_list(
+        "start", flat=True).distinct()[:limit])
+    changes = {start: {} for start in reversed(starts)}
+    if starts:
+        for start, choice_id, votes in rollups.filter(
+                start__gte=starts[-1]).values_list(
+                "start", "choice_id", "votes"):
+            changes[start][choice_id] = votes
+    totals = dict(Choice.objects.filter(question=question).values_list(
+        "id", "vote_count"))
+    history = []
+    for start, change in reversed(changes.items()):
+        history.append((start, change, dict(totals)))
+        for choice_id, votes in change.items():
+            totals[choice_id] = totals.get(choice_id, 0) - votes
+    history.reverse()
+    return history
@@ -0,0 +1,131 @@
+import json
+import random
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from polls.benchmark import (benchmark_database, compare_results,
+                             format_table, run_load, save_results, seed)
+
+SCENARIOS = ["index", "detail", "results", "vote"]
+
+
+class Command(BaseCommand):
+    help = ("Benchmark the polls pages and the vote endpoint on a seeded "
+            "temporary database, optionally against a saved baseline.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--questions", type=int, default=50)
+        parser.add_argument("--choices", type=int, default=5,
+                            help="Choices per question.")
+        parser.add_argument("--users", type=int, default=500)
+        parser.add_argument("--votes", type=int, default=10,
+                            help="Votes per user when seeding.")
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--requests", type=int, default=1000,
+                            help="Requests per scenario.")
+        parser.add_argument("--scenario", action="append",
+                            choices=SCENARIOS,
+                            help="Scenario to run (repeatable); default all.")
+        parser.add_argument("--session-profile",
+                            choices=list(settings.SESSION_PROFILES),
+                            help="Keep sessions and messages as with this "
+                                 "SESSION_PROFILE; default the current one.")
+        parser.add_argument("--seed", type=int, default=0,
+                            help="Random seed, for repeatable runs.")
+        parser.add_argument("--save", metavar="FILE",
+                            help="Save the results as a JSON baseline.")
+        parser.add_argument("--compare", metavar="FILE",
+                            help="Fail if the results regress from this "
+                                 "baseline.")
+        parser.add_argument("--tolerance", type=float, default=0.25,
+                            help="Allowed latency/throughput change as a "
+                                 "fraction of the baseline.")
+
+    def handle(self, *args, **options):
+        if not 0 < options["threads"] <= options["users"]:
+            # every thread logs in as a different user
+            raise CommandError("--threads must be between 1 and --users.")
+        random.seed(options["seed"])
+        profile = options["session_profile"] or settings.SESSION_PROFILE
+        # every thread votes as fast as it can, from one address
+        with benchmark_database(), \
+                override_settings(VOTE_USER_RATE=0, VOTE_IP_RATE=0,
+                                  **settings.SESSION_PROFILES[profile]):
+            self.question_ids, self.choice_ids, self.user_ids = seed(
+                options["questions"], options["choices"], options["users"],
+                options["votes"])
+            self.clients = self.make_clients(options["threads"])
+            scenarios = {}
+            for name in options["scenario"] or SCENARIOS:
+                try:
+                    scenarios[name] = run_load(
+                        getattr(self, f"request_{name}"),
+                        options["requests"], options["threads"])
+                except OperationalError as error:
+                    # deferred transactions fail at once on a write conflict
+                    raise CommandError(
+                        f"{name}: {error}; concurrent votes need "
+                        f"SQLITE_PRODUCTION=True.") from error
+        results = {
+            "config": {**{key: options[key] for key in (
+                "questions", "choices", "users", "votes", "threads",
+                "requests", "seed")}, "session_profile": profile},
+            "scenarios": scenarios,
+        }
+        for line in format_table(scenarios):
+            self.stdout.write(line)
+        if options["save"]:
+            save_results(options["save"], results)
+            self.stdout.write(f"Saved baseline to {options['save']}")
+        if options["compare"]:
+            with open(options["compare"]) as file:
+                baseline = json.load(file)
+            regressions = compare_results(baseline, results,
+                                          options["tolerance"])
+            if regressions:
+                raise CommandError("Regressions found:\n" +
+                                   "\n".join(regressions))
+            self.stdout.write(self.style.SUCCESS("No regressions."))
+
+    def make_clients(self, threads):
+        """Return one logged-in test client per thread."""
+        clients = []
+        for user_id in random.sample(self.user_ids, threads):
+            client = Client()
+            client.force_login(User.objects.get(pk=user_id))
+            clients.append(client)
+        return clients
+
+    def expect_ok(self, response):
+        """Raise an error if a request did not succeed."""
+        if response.status_code != 200:
+            raise CommandError(
+                f"{response.request['PATH_INFO']} returned "
+                f"{response.status_code}")
+
+    def request_index(self, worker, n):
+        self.expect_ok(self.clients[worker].get(reverse("polls:index")))
+
+    def request_detail(self, worker, n):
+        question_id = random.choice(self.question_ids)
+        self.expect_ok(self.clients[worker].get(
+            reverse("polls:detail", args=(question_id,))))
+
+    def request_results(self, worker, n):
+        question_id = random.choice(self.question_ids)
+        self.expect_ok(self.clients[worker].get(
+            reverse("polls:results", args=(question_id,))))
+
+    def request_vote(self, worker, n):
+        # follows the redirect to the results page like a browser, which
+        # also consumes the flash message stored by the vote
+        question_id = random.choice(self.question_ids)
+        choice_id = random.choice(self.choice_ids[question_id])
+        self.expect_ok(self.clients[worker].post(
+            reverse("polls:vote", args=(question_id,)),
+            {"choice": choice_id}, follow=True))
@@ -0,0 +1,142 @@
+import json
+import random
+from importlib import import_module
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth import (BACKEND_SESSION_KEY, HASH_SESSION_KEY,
+                                 SESSION_KEY)
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+from polls.benchmark import (compare_results, format_table, run_http_load,
+                             save_results)
+from polls.models import Choice, Question
+
+SCENARIOS = ["index", "detail", "results", "vote"]
+
+
+class Command(BaseCommand):
+    help = ("Benchmark a running server (e.g. uvicorn mysite.asgi:application)"
+            " with many concurrent keep-alive connections.  Run it once with "
+            "POLLS_ASYNC_VIEWS off and once on to compare the views.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("url", nargs="?", default="http://127.0.0.1:8000",
+                            help="Base URL of the server.")
+        parser.add_argument("--connections", type=int, default=100)
+        parser.add_argument("--requests", type=int, default=5000,
+                            help="Requests per scenario.")
+        parser.add_argument("--scenario", action="append",
+                            choices=SCENARIOS,
+                            help="Scenario to run (repeatable); default all.")
+        parser.add_argument("--login", action="append", metavar="USERNAME",
+                            help="Send requests as this user (repeatable; "
+                                 "the connections take turns).  Needed for "
+                                 "the vote scenario.  The server must use "
+                                 "this project's database sessions.")
+        parser.add_argument("--seed", type=int, default=0,
+                            help="Random seed, for repeatable runs.")
+        parser.add_argument("--save", metavar="FILE",
+                            help="Save the results as a JSON baseline.")
+        parser.add_argument("--compare", metavar="FILE",
+                            help="Fail if the results regress from this "
+                                 "baseline.")
+        parser.add_argument("--tolerance", type=float, default=0.25,
+                            help="Allowed latency/throughput change as a "
+                                 "fraction of the baseline.")
+
+    def handle(self, *args, **options):
+        random.seed(options["seed"])
+        names = options["scenario"] or SCENARIOS
+        if "vote" in names and not options["login"]:
+            raise CommandError("The vote scenario needs --login.")
+        self.choice_ids = {}
+        for question_id, choice_id in Choice.objects.filter(
+                question__in=Question.objects.open_for_voting()) \
+                .values_list("question_id", "id"):
+            self.choice_ids.setdefault(question_id, []).append(choice_id)
+        if not self.choice_ids:
+            raise CommandError("There are no open questions with choices.")
+        self.question_ids = list(self.choice_ids)
+        self.headers = [self.make_headers(username)
+                        for username in options["login"] or [None]]
+
+        scenarios = {}
+        for name in names:
+            scenarios[name] = run_http_load(
+                options["url"], getattr(self, f"request_{name}"),
+                options["requests"], options["connections"])
+        results = {
+            "config": {key: options[key] for key in (
+                "url", "connections", "requests", "seed")},
+            "scenarios": scenarios,
+        }
+        for line in format_table(scenarios):
+            self.stdout.write(line)
+        if options["save"]:
+            save_results(options["save"], results)
+            self.stdout.write(f"Saved baseline to {options['save']}")
+        if options["compare"]:
+            with open(options["compare"]) as file:
+                baseline = json.load(file)
+            regressions = compare_results(baseline, results,
+                                          options["tolerance"])
+            if regressions:
+                raise CommandError("Regressions found:\n" +
+                                   "\n".join(regressions))
+            self.stdout.write(self.style.SUCCESS("No regressions."))
+
+    def make_headers(self, username):
+        """
+        Return the request headers of a client, logged in as `username`
+        (if given) through a new session in the database, with a CSRF
+        token for posting votes.
+        """
+        csrf_token = get_random_string(32)
+        cookies = {settings.CSRF_COOKIE_NAME: csrf_token}
+        if username is not None:
+            try:
+                user = User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f"Unknown user: {username}")
+            engine = import_module(settings.SESSION_ENGINE)
+            session = engine.SessionStore()
+            session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+            session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+            session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+            session.save()
+            cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+        return [
+            ("Cookie", "; ".join(f"{name}={value}"
+                                 for name, value in cookies.items())),
+            ("X-CSRFToken", csrf_token),
+        ]
+
+    def get_request(self, worker, path):
+        return "GET", path, self.headers[worker % len(self.headers)], b""
+
+    def request_index(self, worker, n):
+        return self.get_request(worker, reverse("polls:index"))
+
+    def request_detail(self, worker, n):
+        question_id = random.choice(self.question_ids)
+        return self.get_request(worker,
+                                reverse("polls:detail", args=(question_id,)))
+
+    def request_results(self, worker, n):
+        question_id = random.choice(self.question_ids)
+        return self.get_request(worker,
+                                reverse("polls:results", args=(question_id,)))
+
+    def request_vote(self, worker, n):
+        # the redirect to the results page is followed like a browser,
+        # which also consumes the flash message stored by the vote
+        question_id = random.choice(self.question_ids)
+        choice_id = random.choice(self.choice_ids[question_id])
+        headers = self.headers[worker % len(self.headers)] + [
+            ("Content-Type", "application/x-www-form-urlencoded")]
+        return ("POST", reverse("polls:vote", args=(question_id,)), headers,
+                urlencode({"choice": choice_id}).encode())
@@ -0,0 +1,68 @@
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from polls.benchmark import benchmark_database, format_table, run_load
+
+PASSWORD = "correct horse battery 42"
+
+
+class Command(BaseCommand):
+    help = ("Benchmark signup and login throughput with each password "
+            "hasher profile (PASSWORD_HASHER_PROFILES).  With one thread, "
+            "the throughput is per CPU core.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--profile", action="append",
+                            choices=list(settings.PASSWORD_HASHER_PROFILES),
+                            help="Profile to run (repeatable); default all.")
+        parser.add_argument("--requests", type=int, default=20,
+                            help="Signups and logins per profile.")
+        parser.add_argument("--threads", type=int, default=1)
+
+    def handle(self, *args, **options):
+        scenarios = {}
+        with benchmark_database(), \
+                override_settings(VOTE_USER_RATE=0, VOTE_IP_RATE=0):
+            for name in (options["profile"]
+                         or settings.PASSWORD_HASHER_PROFILES):
+                with override_settings(
+                        PASSWORD_HASHERS=settings.PASSWORD_HASHER_PROFILES[
+                            name]):
+                    try:
+                        make_password(PASSWORD)
+                    except ValueError as error:
+                        # the hasher's library is not installed
+                        self.stderr.write(f"Skipping {name}: {error}")
+                        continue
+                    self.profile = name
+                    self.clients = [Client()
+                                    for _ in range(options["threads"])]
+                    for action in ("signup", "login"):
+                        scenarios[f"{name} {action}"] = run_load(
+                            getattr(self, f"request_{action}"),
+                            options["requests"], options["threads"])
+        for line in format_table(scenarios):
+            self.stdout.write(line)
+
+    def expect_redirect(self, response):
+        """Raise an error if a signup or login did not succeed."""
+        if response.status_code != 302:
+            raise CommandError(
+                f"{response.request['PATH_INFO']} returned "
+                f"{response.status_code}")
+
+    def request_signup(self, worker, n):
+        self.expect_redirect(self.clients[worker].post(reverse("signup"), {
+            "username": f"{self.profile}{n}",
+            "password1": PASSWORD,
+            "password2": PASSWORD,
+        }))
+
+    def request_login(self, worker, n):
+        self.expect_redirect(self.clients[worker].post(reverse("login"), {
+            "username": f"{self.profile}{n}",
+            "password": PASSWORD,
+        }))
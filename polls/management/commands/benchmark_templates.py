@@ -0,0 +1,99 @@
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import get_template, render_to_string
+from django.test import RequestFactory
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+
+from polls.benchmark import percentile
+from polls.models import Choice, Question
+
+TEMPLATES = ["question_list", "index", "detail", "results_table", "results"]
+
+
+def make_questions(count):
+    """Return unsaved open questions with ids."""
+    now = timezone.now()
+    questions = [Question(id=n, question_text=f"Question {n}", pub_date=now)
+                 for n in range(1, count + 1)]
+    for question in questions:
+        question.is_open = True
+    return questions
+
+
+def make_choices(count):
+    """Return a question and unsaved choices with results."""
+    question = make_questions(1)[0]
+    choices = [Choice(id=n, question=question, choice_text=f"Choice {n}",
+                      vote_count=n) for n in range(1, count + 1)]
+    total = sum(choice.vote_count for choice in choices)
+    for choice in choices:
+        choice.total_votes = total
+        choice.percentage = 100 * choice.vote_count / total
+    return question, choices
+
+
+class Command(BaseCommand):
+    help = ("Measure the render time of each polls template with 10, 100 "
+            "and 1000 questions or choices, without the database.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+",
+                            default=[10, 100, 1000])
+        parser.add_argument("--repeat", type=int, default=20,
+                            help="Renders per template and size.")
+        parser.add_argument("--template", action="append", choices=TEMPLATES,
+                            help="Template to render (repeatable); "
+                                 "default all.")
+        parser.add_argument("--max-ms", type=float,
+                            help="Fail if a median render takes longer.")
+
+    def handle(self, *args, **options):
+        self.request = RequestFactory().get("/polls/")
+        self.request.user = AnonymousUser()
+        self.stdout.write(f"{'template':<16}{'size':>7}{'p50 ms':>9}"
+                          f"{'p95 ms':>9}{'bytes':>10}")
+        slow = []
+        for name in options["template"] or TEMPLATES:
+            for size in options["sizes"]:
+                context = getattr(self, f"context_{name}")(size)
+                template = get_template(f"polls/{name}.html")
+                times = []
+                for _ in range(options["repeat"]):
+                    started = time.perf_counter()
+                    html = template.render(context, self.request)
+                    times.append(time.perf_counter() - started)
+                times.sort()
+                p50 = percentile(times, 0.50) * 1000
+                self.stdout.write(
+                    f"{name:<16}{size:>7}{p50:>9.2f}"
+                    f"{percentile(times, 0.95) * 1000:>9.2f}{len(html):>10}")
+                if options["max_ms"] is not None and p50 > options["max_ms"]:
+                    slow.append(f"{name} with {size}: {p50:.2f} ms")
+        if slow:
+            raise CommandError("Slower than --max-ms:\n" + "\n".join(slow))
+
+    def context_question_list(self, size):
+        return {"latest_question_list": make_questions(size),
+                "next_page": "?cursor=x"}
+
+    def context_index(self, size):
+        # the page around the cached question list
+        return {"fragment": mark_safe(render_to_string(
+            "polls/question_list.html", self.context_question_list(size)))}
+
+    def context_detail(self, size):
+        question, choices = make_choices(size)
+        return {"question": question, "choices": choices,
+                "choice_voted": choices[-1].id}
+
+    def context_results_table(self, size):
+        question, choices = make_choices(size)
+        return {"question": question, "choices": choices,
+                "total_votes": choices[0].total_votes}
+
+    def context_results(self, size):
+        return {"question_id": 1, "fragment": mark_safe(render_to_string(
+            "polls/results_table.html", self.context_results_table(size)))}
@@ -0,0 +1,204 @@
+import csv
+import json
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.core.serializers.base import DeserializationError
+from django.core.serializers.python import Deserializer
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from polls.cache import bump_version
+from polls.history import add_votes_to_rollups
+from polls.models import Question, QuestionResultSnapshot, Vote, VoteEvent
+from polls.voting import recount_votes, results_changed
+
+
+def iter_json_array(stream, chunk_size=1 << 16):
+    """
+    Yield the items of a top-level JSON array one at a time, reading the
+    file in chunks so that memory does not grow with the file size.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    started = False
+    eof = False
+    while True:
+        buffer = buffer.lstrip()
+        if not started:
+            if buffer:
+                if buffer[0] != "[":
+                    raise CommandError("Expected a JSON array of objects.")
+                buffer = buffer[1:]
+                started = True
+                continue
+        elif buffer.startswith("]"):
+            return
+        elif buffer.startswith(","):
+            buffer = buffer[1:]
+            continue
+        elif buffer:
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                yield item
+                buffer = buffer[end:]
+                continue
+        if eof:
+            raise CommandError("Unexpected end of JSON file.")
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        buffer += chunk
+
+
+def iter_jsonl(stream):
+    """Yield one fixture object per non-empty line."""
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_csv(stream, model_label):
+    """
+    Yield fixture objects for the rows of a CSV file with a header of
+    field names.  A `pk` or `id` column sets the primary key and empty
+    cells are read as NULL.
+    """
+    for row in csv.DictReader(stream):
+        fields = {name: (value if value != "" else None)
+                  for name, value in row.items()}
+        pk = fields.pop("pk", None) or fields.pop("id", None)
+        yield {"model": model_label, "pk": pk, "fields": fields}
+
+
+class Command(BaseCommand):
+    help = ("Load a large fixture (JSON, JSONL or CSV) with batched "
+            "bulk_create, using bounded memory.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("file", help="Fixture file to load.")
+        parser.add_argument(
+            "--format", choices=["json", "jsonl", "csv"],
+            help="File format; guessed from the file extension if omitted.")
+        parser.add_argument(
+            "--model", help="Model of the rows of a CSV file, e.g. polls.vote.")
+        parser.add_argument(
+            "--batch-size", type=int, default=5000,
+            help="Objects per bulk_create.")
+        parser.add_argument(
+            "--database", default=DEFAULT_DB_ALIAS,
+            help="Database to load into.")
+
+    def handle(self, *args, **options):
+        path = options["file"]
+        file_format = options["format"] or path.rsplit(".", 1)[-1].lower()
+        if file_format not in ("json", "jsonl", "csv"):
+            raise CommandError(f"Unknown fixture format: {file_format}")
+        if file_format == "csv" and not options["model"]:
+            raise CommandError("--model is required for CSV files.")
+        self.using = options["database"]
+        self.batch_size = options["batch_size"]
+        self.verbosity = options["verbosity"]
+        # the questions that got votes
+        self.voted_questions = set()
+        connection = connections[self.using]
+
+        with open(path, newline="", encoding="utf-8") as stream:
+            if file_format == "json":
+                items = iter_json_array(stream)
+            elif file_format == "jsonl":
+                items = iter_jsonl(stream)
+            else:
+                items = iter_csv(stream, options["model"])
+            # foreign keys are checked once at the end, so objects may
+            # refer to rows that are still waiting in another batch; a
+            # failed check rolls back the whole file, like loaddata
+            with connection.constraint_checks_disabled(), \
+                    transaction.atomic(using=self.using):
+                loaded_models = self.load(items)
+                table_names = [model._meta.db_table
+                               for model in loaded_models]
+                connection.check_constraints(table_names=table_names)
+                sequence_sql = connection.ops.sequence_reset_sql(
+                    no_style(), loaded_models)
+                with connection.cursor() as cursor:
+                    for line in sequence_sql:
+                        cursor.execute(line)
+                # bulk_create skips save() and signals, so rebuild the
+                # data that they would have maintained
+                if Vote in loaded_models:
+                    recount_votes(fix=True)
+                    QuestionResultSnapshot.objects.using(self.using).filter(
+                        question_id__in=self.voted_questions).delete()
+        if Question in loaded_models:
+            bump_version("questions")
+        if self.voted_questions:
+            results_changed(self.voted_questions)
+
+    def load(self, items):
+        """Insert the fixture objects in batches; return the models seen."""
+        pending = defaultdict(list)
+        loaded_models = set()
+        self.count = 0
+        self.started = time.monotonic()
+        # report progress every 100000 objects, or every batch with -v 2
+        self.report_every = self.batch_size if self.verbosity >= 2 else 100000
+        self.next_report = self.report_every
+        try:
+            for obj in Deserializer(items, using=self.using):
+                model = type(obj.object)
+                loaded_models.add(model)
+                pending[model].append(obj)
+                if len(pending[model]) >= self.batch_size:
+                    self.flush(model, pending.pop(model))
+        except DeserializationError as error:
+            raise CommandError(f"Invalid fixture: {error}") from error
+        for model, objs in pending.items():
+            self.flush(model, objs)
+        if self.verbosity:
+            self.stdout.write(self.style.SUCCESS(
+                f"Loaded {self.count} objects in "
+                f"{time.monotonic() - self.started:.1f}s."))
+        return loaded_models
+
+    def flush(self, model, objs):
+        """Insert one batch of objects of a model and their m2m rows."""
+        model._base_manager.using(self.using).bulk_create(
+            [obj.object for obj in objs])
+        if model is Vote:
+            self.log_votes([obj.object for obj in objs])
+        for field_name in {name for obj in objs for name in obj.m2m_data}:
+            field = model._meta.get_field(field_name)
+            through = field.remote_field.through
+            source = field.m2m_field_name()
+            target = field.m2m_reverse_field_name()
+            through._base_manager.using(self.using).bulk_create([
+                through(**{f"{source}_id": obj.object.pk,
+                           f"{target}_id": pk})
+                for obj in objs for pk in obj.m2m_data.get(field_name, [])
+            ])
+        self.count += len(objs)
+        if self.verbosity and self.count >= self.next_report:
+            self.next_report += self.report_every
+            elapsed = time.monotonic() - self.started
+            self.stdout.write(
+                f"{self.count} objects loaded "
+                f"({self.count / max(elapsed, 1e-9):.0f}/s)")
+
+    def log_votes(self, votes):
+        """
+        Add a batch of new votes to the vote event log and the rollups at
+        the time they were cast, so that the vote history adds up to the
+        rebuilt counters.
+        """
+        VoteEvent.objects.using(self.using).bulk_create(
+            VoteEvent(user_id=vote.user_id, question_id=vote.question_id,
+                      new_choice_id=vote.choice_id, timestamp=vote.voted_at)
+            for vote in votes)
+        add_votes_to_rollups((vote.question_id, vote.choice_id,
+                              vote.voted_at) for vote in votes)
+        self.voted_questions.update(vote.question_id for vote in votes)
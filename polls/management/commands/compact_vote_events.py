@@ -0,0 +1,30 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from polls.history import PERIODS, compact_events
+from polls.models import VoteRollup
+
+
+class Command(BaseCommand):
+    help = ("Fold old vote events into per-period vote count checkpoints "
+            "and delete them, keeping the recent events.  Minute rollups "
+            "as old are deleted too; the hour and day rollups stay.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--keep-days", type=float, default=7,
+                            help="Days of events to keep uncompacted.")
+        parser.add_argument("--period", choices=list(PERIODS),
+                            default="hour",
+                            help="One checkpoint per period with events.")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - datetime.timedelta(
+            days=options["keep_days"])
+        folded = compact_events(cutoff, PERIODS[options["period"]])
+        deleted = VoteRollup.objects.filter(bucket="minute",
+                                            start__lt=cutoff).delete()[0]
+        self.stdout.write(self.style.SUCCESS(
+            f"Compacted {folded} vote event(s) and deleted {deleted} "
+            f"minute rollup(s)."))
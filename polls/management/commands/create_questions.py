@@ -0,0 +1,42 @@
+import json
+import sys
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.authoring import create_questions
+
+
+class Command(BaseCommand):
+    help = ("Create questions with their choices from a JSON list, in one "
+            "transaction.  Each item looks like {\"question_text\": ..., "
+            "\"pub_date\": ..., \"end_date\": ..., \"choices\": [...]}.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("file",
+                            help="JSON file to read; - for standard input.")
+        parser.add_argument("--batch-size", type=int, default=1000,
+                            help="Objects per bulk_create.")
+
+    def handle(self, *args, **options):
+        try:
+            if options["file"] == "-":
+                items = json.load(sys.stdin)
+            else:
+                with open(options["file"], encoding="utf-8") as file:
+                    items = json.load(file)
+        except ValueError as error:
+            raise CommandError(f"Invalid JSON: {error}") from error
+        try:
+            created = create_questions(items, options["batch_size"])
+        except ValidationError as error:
+            if hasattr(error, "error_dict"):
+                messages = [f"item {index}: {message}"
+                            for index, errors in error.message_dict.items()
+                            for message in errors]
+            else:
+                messages = error.messages
+            raise CommandError("Invalid questions:\n" + "\n".join(messages))
+        choices = sum(len(choices) for _, choices in created)
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(created)} questions with {choices} choices."))
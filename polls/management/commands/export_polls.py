@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.export import (EXPORT_FORMATS, all_results, format_rows,
+                          question_results, question_votes)
+from polls.models import Question
+
+
+class Command(BaseCommand):
+    help = ("Export poll results or raw votes as CSV or JSON Lines. "
+            "Without a question id, export the results of all questions.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("question_id", nargs="?", type=int,
+                            help="Question to export.")
+        parser.add_argument("--kind", choices=["results", "votes"],
+                            default="results",
+                            help="Export vote counts or every vote.")
+        parser.add_argument("--format", choices=list(EXPORT_FORMATS),
+                            default="csv", help="Output format.")
+        parser.add_argument("--output", "-o",
+                            help="File to write; standard output if omitted.")
+
+    def handle(self, *args, **options):
+        question_id = options["question_id"]
+        if question_id is None:
+            if options["kind"] != "results":
+                raise CommandError("Votes can only be exported per question.")
+            rows = all_results()
+        else:
+            try:
+                question = Question.objects.select_related(
+                    "snapshot").get(pk=question_id)
+            except Question.DoesNotExist:
+                raise CommandError(f"Question {question_id} does not exist.")
+            if options["kind"] == "votes":
+                rows = question_votes(question)
+            else:
+                rows = question_results(question)
+
+        lines = format_rows(rows, options["format"])
+        if options["output"]:
+            with open(options["output"], "w", newline="",
+                      encoding="utf-8") as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending="")
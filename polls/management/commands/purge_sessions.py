@@ -0,0 +1,36 @@
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = ("Delete expired sessions from the database in small batches, "
+            "so that voters never wait long for the write lock.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000,
+                            help="Sessions deleted per transaction.")
+        parser.add_argument("--pause", type=float, default=0.0,
+                            help="Seconds to sleep between batches.")
+
+    def handle(self, *args, **options):
+        if settings.SESSION_ENGINE.endswith("signed_cookies"):
+            self.stdout.write("Sessions are kept in cookies; nothing to do.")
+            return
+        now = timezone.now()
+        expired = Session.objects.filter(expire_date__lt=now)
+        deleted = 0
+        while True:
+            # each delete runs in its own short transaction
+            keys = list(expired.values_list("pk", flat=True)
+                        [:options["batch_size"]])
+            if not keys:
+                break
+            deleted += Session.objects.filter(pk__in=keys).delete()[0]
+            if options["pause"]:
+                time.sleep(options["pause"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {deleted} expired session(s)."))
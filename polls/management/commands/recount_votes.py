@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.voting import recount_votes
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-choice vote counters from the Vote table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check", action="store_true",
+            help="Only report wrong counters; exit with an error if any.")
+
+    def handle(self, *args, **options):
+        check = options["check"]
+        mismatched = recount_votes(fix=not check)
+        for choice, counted in mismatched:
+            self.stdout.write(
+                f"Choice {choice.pk} ({choice}): "
+                f"counter {choice.vote_count}, actual {counted}")
+        if check and mismatched:
+            raise CommandError(
+                f"{len(mismatched)} vote counter(s) out of sync.")
+        if check:
+            self.stdout.write(self.style.SUCCESS("All vote counters match."))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"Fixed {len(mismatched)} vote counter(s)."))
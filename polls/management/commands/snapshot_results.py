@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from polls.models import Question, QuestionResultSnapshot
+
+
+class Command(BaseCommand):
+    help = "Freeze the results of closed questions that have no snapshot."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--refresh", action="store_true",
+            help="Also retake snapshots that already exist.")
+
+    def handle(self, *args, **options):
+        questions = Question.objects.closed()
+        if not options["refresh"]:
+            questions = questions.filter(snapshot__isnull=True)
+        count = 0
+        for question in questions.iterator():
+            QuestionResultSnapshot.take(question)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Saved {count} snapshot(s)."))
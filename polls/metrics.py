@@ -0,0 +1,76 @@
+"""
+Request metrics in the Prometheus text exposition format.
+
+QueryMetricsMiddleware records the latency, number of database queries
+and database time of every request into the histograms below, labelled
+by URL name; the metrics view renders them for a Prometheus scraper.
+"""
+import threading
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    """A Prometheus histogram with one series per label value."""
+
+    def __init__(self, name, help_text, buckets, label="view"):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.label = label
+        self._lock = threading.Lock()
+        # label value -> [bucket counts..., count, sum]
+        self._series = {}
+
+    def observe(self, label_value, value):
+        """Record one observation for a label value."""
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = \
+                    [0] * (len(self.buckets) + 1) + [0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self):
+        """Return the histogram as lines of the text exposition format."""
+        lines = [f"# HELP {self.name} {self.help_text}",
+                 f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: list(values)
+                      for key, values in self._series.items()}
+        for label_value, values in sorted(series.items()):
+            label = f'{self.label}="{label_value}"'
+            for bound, count in zip(self.buckets, values):
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} '
+                             f'{count}')
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} '
+                         f'{values[-2]}')
+            lines.append(f"{self.name}_count{{{label}}} {values[-2]}")
+            lines.append(f"{self.name}_sum{{{label}}} {values[-1]}")
+        return lines
+
+
+request_duration = Histogram(
+    "polls_request_duration_seconds", "Time to build the response.",
+    LATENCY_BUCKETS)
+request_queries = Histogram(
+    "polls_request_queries", "Database queries run per request.",
+    QUERY_BUCKETS)
+request_db_duration = Histogram(
+    "polls_request_db_duration_seconds", "Time spent in database queries.",
+    LATENCY_BUCKETS)
+
+HISTOGRAMS = [request_duration, request_queries, request_db_duration]
+
+
+def render_metrics():
+    """Return all metrics in the Prometheus text exposition format."""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,95 @@
+"""
+Middleware that records the latency, query count and database time of
+every request in polls.metrics, for /metrics.
+"""
+import logging
+import time
+
+from asgiref.sync import (iscoroutinefunction, markcoroutinefunction,
+                           sync_to_async)
+from django.conf import settings
+from django.db import connection
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class QueryTimer:
+    """Counts the database queries of a request and the time they take."""
+
+    def __init__(self):
+        self.queries = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.queries += 1
+
+
+def add_wrapper(timer):
+    """Wrap the queries of the current thread's connection with timer."""
+    connection.execute_wrappers.append(timer)
+
+
+def remove_wrapper(timer):
+    """Undo add_wrapper()."""
+    connection.execute_wrappers.remove(timer)
+
+
+class QueryMetricsMiddleware:
+    """
+    Records the latency, query count and database time of each request by
+    URL name, and logs requests that run more than QUERY_BUDGET queries.
+
+    Under ASGI the queries of a request run in its thread-sensitive worker
+    thread, so the timer is put on that thread's connection, at the cost
+    of two thread hops per request.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timer = QueryTimer()
+        started = time.perf_counter()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+        self.record(request, time.perf_counter() - started, timer)
+        return response
+
+    async def __acall__(self, request):
+        timer = QueryTimer()
+        started = time.perf_counter()
+        await sync_to_async(add_wrapper)(timer)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(remove_wrapper)(timer)
+        self.record(request, time.perf_counter() - started, timer)
+        return response
+
+    def record(self, request, duration, timer):
+        """Record the metrics of a request."""
+        match = request.resolver_match
+        if match is None or match.view_name == "metrics":
+            return
+        view_name = match.view_name
+        metrics.request_duration.observe(view_name, duration)
+        metrics.request_queries.observe(view_name, timer.queries)
+        metrics.request_db_duration.observe(view_name, timer.duration)
+        if timer.queries > settings.QUERY_BUDGET:
+            logger.warning(
+                "%s %s ran %d queries (budget %d) in %.1f ms",
+                request.method, request.path, timer.queries,
+                settings.QUERY_BUDGET, duration * 1000)
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:40
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_vote_count(apps, schema_editor):
+    """Set each choice's counter to the number of existing votes."""
+    Choice = apps.get_model('polls', 'Choice')
+    for choice in Choice.objects.annotate(counted=Count('vote')):
+        if choice.counted:
+            Choice.objects.filter(pk=choice.pk).update(
+                vote_count=choice.counted)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0003_remove_choice_votes_alter_question_pub_date_vote'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='choice',
+            name='vote_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_vote_count, migrations.RunPython.noop),
+    ]
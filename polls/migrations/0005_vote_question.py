@@ -0,0 +1,52 @@
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def fill_vote_question(apps, schema_editor):
+    """
+    Copy each vote's question from its choice and remove duplicate votes,
+    keeping the latest vote of a user on each question.
+    """
+    Choice = apps.get_model('polls', 'Choice')
+    Vote = apps.get_model('polls', 'Vote')
+    Vote.objects.update(question=Subquery(
+        Choice.objects.filter(pk=OuterRef('choice_id'))
+        .values('question_id')[:1]))
+    duplicates = (Vote.objects.values('user', 'question')
+                  .annotate(latest=Max('id'), n=Count('id'))
+                  .filter(n__gt=1))
+    for dup in duplicates:
+        Vote.objects.filter(user=dup['user'], question=dup['question']) \
+            .exclude(id=dup['latest']).delete()
+    if duplicates:
+        # the deleted votes were still counted by their choices
+        Choice.objects.update(vote_count=Coalesce(Subquery(
+            Vote.objects.filter(choice=OuterRef('pk'))
+            .values('choice').annotate(n=Count('id')).values('n')[:1]), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0004_choice_vote_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vote',
+            name='question',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='polls.question'),
+        ),
+        migrations.RunPython(fill_vote_question, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='vote',
+            name='question',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='polls.question'),
+        ),
+        migrations.AddConstraint(
+            model_name='vote',
+            constraint=models.UniqueConstraint(fields=('user', 'question'), name='unique_vote_per_question'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0006_question_pub_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionResultSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_votes', models.PositiveIntegerField()),
+                ('choices', models.JSONField()),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='snapshot', to='polls.question')),
+            ],
+        ),
+    ]
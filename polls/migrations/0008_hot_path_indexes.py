@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0007_questionresultsnapshot'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='choice',
+            index=models.Index(fields=['question', 'id'], name='choice_question_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['end_date', 'pub_date'], name='question_end_date_pub_date_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def checkpoint_current_counts(apps, schema_editor):
+    """
+    Start the history with the current vote counts, since the votes cast
+    so far have no events.
+    """
+    Choice = apps.get_model('polls', 'Choice')
+    VoteCheckpoint = apps.get_model('polls', 'VoteCheckpoint')
+    now = django.utils.timezone.now()
+    VoteCheckpoint.objects.bulk_create(
+        (VoteCheckpoint(question_id=question_id, choice_id=choice_id, at=now,
+                        vote_count=vote_count)
+         for choice_id, question_id, vote_count in Choice.objects.values_list(
+             'id', 'question_id', 'vote_count').iterator()),
+        batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('polls', '0008_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VoteEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now)),
+                ('new_choice', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='polls.choice')),
+                ('old_choice', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='polls.choice')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='polls.question')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['question', 'timestamp'], name='voteevent_question_time_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='VoteCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('at', models.DateTimeField()),
+                ('vote_count', models.IntegerField()),
+                ('choice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='polls.choice')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='polls.question')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['question', 'at'], name='votecheckpoint_question_at_idx')],
+            },
+        ),
+        migrations.RunPython(checkpoint_current_counts,
+                             migrations.RunPython.noop),
+    ]
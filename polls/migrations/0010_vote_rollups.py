@@ -0,0 +1,112 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:15
+
+import datetime
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def bucket_starts(moment):
+    """Return the start of the minute, hour and day (UTC) of a time."""
+    minute = moment.astimezone(datetime.timezone.utc).replace(
+        second=0, microsecond=0)
+    return {'minute': minute, 'hour': minute.replace(minute=0),
+            'day': minute.replace(hour=0, minute=0)}
+
+
+def roll_up_history(apps, schema_editor):
+    """
+    Build the rollups from the vote event log of 0009_vote_events: each
+    event in its own buckets, and the votes folded into each checkpoint
+    just before the checkpoint.  The votes cast before the log existed
+    are in the first checkpoint, so they show up when 0009 was applied,
+    and votes the log does not explain are counted now.  Votes get the
+    time of their last event.
+    """
+    Choice = apps.get_model('polls', 'Choice')
+    Vote = apps.get_model('polls', 'Vote')
+    VoteCheckpoint = apps.get_model('polls', 'VoteCheckpoint')
+    VoteEvent = apps.get_model('polls', 'VoteEvent')
+    VoteRollup = apps.get_model('polls', 'VoteRollup')
+    deltas = Counter()
+    # the votes of each choice that the log explains
+    explained = Counter()
+
+    def add(question_id, choice_id, moment, votes):
+        for bucket, start in bucket_starts(moment).items():
+            deltas[(question_id, choice_id, bucket, start)] += votes
+        explained[choice_id] += votes
+
+    checkpoints = VoteCheckpoint.objects.order_by('at').values_list(
+        'question_id', 'choice_id', 'at', 'vote_count')
+    for question_id, choice_id, at, vote_count in checkpoints.iterator():
+        # a checkpoint counts the events before `at`
+        add(question_id, choice_id, at - datetime.timedelta(microseconds=1),
+            vote_count - explained[choice_id])
+    # the events that are left all follow the last checkpoint
+    events = VoteEvent.objects.values_list(
+        'question_id', 'old_choice_id', 'new_choice_id', 'timestamp')
+    for question_id, old_choice_id, new_choice_id, timestamp in \
+            events.iterator():
+        if old_choice_id is not None:
+            add(question_id, old_choice_id, timestamp, -1)
+        if new_choice_id is not None:
+            add(question_id, new_choice_id, timestamp, 1)
+    now = django.utils.timezone.now()
+    choices = Choice.objects.values_list('id', 'question_id', 'vote_count')
+    for choice_id, question_id, vote_count in choices.iterator():
+        if vote_count != explained[choice_id]:
+            add(question_id, choice_id, now,
+                vote_count - explained[choice_id])
+    existing = set(Choice.objects.values_list('id', flat=True))
+    VoteRollup.objects.bulk_create(
+        (VoteRollup(question_id=question_id, choice_id=choice_id,
+                    bucket=bucket, start=start, votes=votes)
+         for (question_id, choice_id, bucket, start), votes in deltas.items()
+         if votes and choice_id in existing),
+        batch_size=1000)
+
+    last_event = VoteEvent.objects.filter(
+        user=OuterRef('user'), question=OuterRef('question'),
+        new_choice__isnull=False).order_by('-timestamp').values('timestamp')
+    Vote.objects.update(
+        voted_at=Coalesce(Subquery(last_event[:1]), F('voted_at')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0009_vote_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vote',
+            name='voted_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.CreateModel(
+            name='VoteRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.CharField(choices=[('minute', 'Minute'), ('hour', 'Hour'), ('day', 'Day')], max_length=6)),
+                ('start', models.DateTimeField()),
+                ('votes', models.IntegerField(default=0)),
+                ('choice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='polls.choice')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='polls.question')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['question', 'bucket', 'start'], name='voterollup_question_start_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='voterollup',
+            constraint=models.UniqueConstraint(fields=('choice', 'bucket', 'start'), name='unique_rollup_per_bucket'),
+        ),
+        migrations.RunPython(roll_up_history,
+                             migrations.RunPython.noop),
+    ]
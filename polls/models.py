@@ -1,9 +1,40 @@
 import datetime
 from django.db import models
+from django.db.models import ExpressionWrapper, Q, Sum, Window
 from django.utils import timezone
 from django.contrib.auth.models import User
 
 
+class QuestionQuerySet(models.QuerySet):
+    """
+    Filters questions by their poll state in SQL.  Each method takes an
+    optional `now` so that several filters can share one point in time.
+    """
+    @staticmethod
+    def _open_q(now):
+        return (Q(pub_date__lte=now)
+                & (Q(end_date__isnull=True) | Q(end_date__gt=now)))
+
+    def published(self, now=None):
+        """Questions whose pub_date has passed."""
+        return self.filter(pub_date__lte=now or timezone.now())
+
+    def open_for_voting(self, now=None):
+        """Published questions that have not ended yet."""
+        return self.filter(self._open_q(now or timezone.now()))
+
+    def closed(self, now=None):
+        """Published questions whose end_date has passed."""
+        now = now or timezone.now()
+        return self.filter(pub_date__lte=now, end_date__lte=now)
+
+    def with_is_open(self, now=None):
+        """Annotate each question with `is_open`, like can_vote()."""
+        return self.annotate(is_open=ExpressionWrapper(
+            self._open_q(now or timezone.now()),
+            output_field=models.BooleanField()))
+
+
 class Question(models.Model):
     """
     Represents a poll question.
@@ -12,19 +43,32 @@ class Question(models.Model):
     pub_date = models.DateTimeField("date published", default=timezone.now)
     end_date = models.DateTimeField("date ended", null=True, blank=True)
 
+    objects = QuestionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # supports the keyset pagination of the index page
+            models.Index(fields=["pub_date", "id"],
+                         name="question_pub_date_id_idx"),
+            # supports the closed() filter and finding the next question
+            # to close
+            models.Index(fields=["end_date", "pub_date"],
+                         name="question_end_date_pub_date_idx"),
+        ]
+
     def is_published(self):
         """
         Returns True if the question is published.
         """
-        return self.pub_date <= timezone.localtime(timezone.now())
+        return self.pub_date <= timezone.now()
 
     def can_vote(self):
         """
         Returns True if the question can be voted on.
         """
-        return self.pub_date <= timezone.localtime(timezone.now()) \
-            and ((self.end_date is None) or
-                 (self.end_date > timezone.localtime(timezone.now())))
+        now = timezone.now()
+        return self.pub_date <= now \
+            and ((self.end_date is None) or (self.end_date > now))
 
     def was_published_recently(self):
         """
@@ -33,6 +77,55 @@ class Question(models.Model):
         now = timezone.now()
         return now - datetime.timedelta(days=1) <= self.pub_date <= now
 
+    def is_closed(self):
+        """
+        Returns True if the question has ended, so its results are final.
+        """
+        return self.end_date is not None and self.end_date <= timezone.now()
+
+    def results(self):
+        """
+        Returns the choices of this question with their share of the votes.
+
+        One query fetches every choice together with the question's total
+        vote count; each choice gets `total_votes` and `percentage`.  The
+        results of a closed question come from its QuestionResultSnapshot,
+        which is taken on the first call after the question ends, and
+        again after the question, its choices or its votes change.
+        """
+        if self.is_closed():
+            try:
+                snapshot = self.snapshot
+            except QuestionResultSnapshot.DoesNotExist:
+                snapshot = QuestionResultSnapshot.take(self)
+            return snapshot.results()
+        return self._add_percentages(list(self._results_queryset()))
+
+    async def aresults(self):
+        """
+        Async version of results().  The snapshot must have been loaded
+        with select_related("snapshot").
+        """
+        if self.is_closed():
+            try:
+                snapshot = self.snapshot
+            except QuestionResultSnapshot.DoesNotExist:
+                snapshot = await QuestionResultSnapshot.atake(self)
+            return snapshot.results()
+        return self._add_percentages(
+            [choice async for choice in self._results_queryset()])
+
+    def _results_queryset(self):
+        return self.choice_set.annotate(
+            total_votes=Window(Sum("vote_count"))).order_by("id")
+
+    @staticmethod
+    def _add_percentages(choices):
+        for choice in choices:
+            choice.percentage = (100 * choice.vote_count / choice.total_votes
+                                 if choice.total_votes else 0)
+        return choices
+
     def __str__(self):
         return self.question_text
 
@@ -43,20 +136,181 @@ class Choice(models.Model):
     """
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     choice_text = models.CharField(max_length=200)
+    # Denormalized count of Vote rows for this choice, kept in sync by
+    # polls.voting so that results never need a COUNT(*) over Vote.
+    vote_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # the choices of a question in order, for the results
+            models.Index(fields=["question", "id"],
+                         name="choice_question_id_idx"),
+        ]
 
     @property
     def votes(self):
-        """Return the number count"""
-        return self.vote_set.count()
+        """Return the number of votes for this choice."""
+        return self.vote_count
 
     def __str__(self):
         return self.choice_text
 
 
 class Vote(models.Model):
-    """Record a Vote of a Choice by a User."""
+    """
+    Record a Vote of a Choice by a User.  Cast and delete votes through
+    polls.voting, which keeps the vote counters in sync.
+    """
     user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # Denormalized from choice.question so that (user, question) can be
+    # looked up and constrained without a join.
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
     choice = models.ForeignKey(Choice, on_delete=models.CASCADE)
+    # when the vote was cast or last changed
+    voted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "question"],
+                                    name="unique_vote_per_question"),
+        ]
 
     def __str__(self):
         return f"{self.user} voted for {self.choice}"
+
+
+class QuestionResultSnapshot(models.Model):
+    """The final results of a closed question, frozen when it ended."""
+    question = models.OneToOneField(Question, on_delete=models.CASCADE,
+                                     related_name="snapshot")
+    total_votes = models.PositiveIntegerField()
+    # [{"id": choice id, "choice_text": ..., "votes": ...}, ...]
+    choices = models.JSONField()
+    created = models.DateTimeField(auto_now_add=True)
+
+    @classmethod
+    def take(cls, question):
+        """Save (or replace) the snapshot of a question's current results."""
+        choices = [
+            {"id": pk, "choice_text": text, "votes": votes}
+            for pk, text, votes in cls._choice_rows(question)
+        ]
+        snapshot, _ = cls.objects.update_or_create(
+            question=question, defaults=cls._defaults(choices))
+        question.snapshot = snapshot
+        return snapshot
+
+    @classmethod
+    async def atake(cls, question):
+        """Async version of take()."""
+        choices = [
+            {"id": pk, "choice_text": text, "votes": votes}
+            async for pk, text, votes in cls._choice_rows(question)
+        ]
+        snapshot, _ = await cls.objects.aupdate_or_create(
+            question=question, defaults=cls._defaults(choices))
+        question.snapshot = snapshot
+        return snapshot
+
+    @classmethod
+    def discard(cls, question_ids):
+        """Delete the snapshots of the questions, to be taken again."""
+        cls.objects.filter(question_id__in=question_ids).delete()
+
+    @staticmethod
+    def _choice_rows(question):
+        return question.choice_set.order_by("id").values_list(
+            "id", "choice_text", "vote_count")
+
+    @staticmethod
+    def _defaults(choices):
+        return {"choices": choices,
+                "total_votes": sum(c["votes"] for c in choices)}
+
+    def results(self):
+        """Returns unsaved Choice objects like Question.results()."""
+        choices = []
+        for data in self.choices:
+            choice = Choice(id=data["id"], question=self.question,
+                            choice_text=data["choice_text"],
+                            vote_count=data["votes"])
+            choice.total_votes = self.total_votes
+            choice.percentage = (100 * choice.vote_count / self.total_votes
+                                 if self.total_votes else 0)
+            choices.append(choice)
+        return choices
+
+    def __str__(self):
+        return f"Results of {self.question}"
+
+
+class VoteEvent(models.Model):
+    """
+    One change of a user's vote, in an append-only log written together
+    with the vote.  old_choice is empty for a first vote and new_choice
+    for a deleted vote.  Old events are folded into VoteCheckpoints by
+    polls.history.compact_events().
+    """
+    # kept when the user is deleted, so that the history still adds up
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
+    old_choice = models.ForeignKey(Choice, on_delete=models.SET_NULL,
+                                   null=True, related_name="+")
+    new_choice = models.ForeignKey(Choice, on_delete=models.SET_NULL,
+                                   null=True, related_name="+")
+    timestamp = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["question", "timestamp"],
+                         name="voteevent_question_time_idx"),
+        ]
+
+    def __str__(self):
+        return (f"{self.user} changed their vote from {self.old_choice} "
+                f"to {self.new_choice}")
+
+
+class VoteCheckpoint(models.Model):
+    """The vote count of a choice at a point in time (events before `at`)."""
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
+    choice = models.ForeignKey(Choice, on_delete=models.CASCADE)
+    at = models.DateTimeField()
+    vote_count = models.IntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["question", "at"],
+                         name="votecheckpoint_question_at_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.choice}: {self.vote_count} votes at {self.at}"
+
+
+class VoteRollup(models.Model):
+    """
+    The net change of a choice's vote count during one minute, hour or
+    day, kept up to date with every vote by polls.history.add_to_rollups().
+    """
+    BUCKETS = [("minute", "Minute"), ("hour", "Hour"), ("day", "Day")]
+
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
+    choice = models.ForeignKey(Choice, on_delete=models.CASCADE)
+    bucket = models.CharField(max_length=6, choices=BUCKETS)
+    start = models.DateTimeField()
+    votes = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["choice", "bucket", "start"],
+                                    name="unique_rollup_per_bucket"),
+        ]
+        indexes = [
+            models.Index(fields=["question", "bucket", "start"],
+                         name="voterollup_question_start_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.choice}: {self.votes:+} votes in the {self.bucket} " \
+               f"from {self.start}"
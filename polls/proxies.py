@@ -0,0 +1,25 @@
+"""
+The address of the client of a request behind reverse proxies.
+
+Behind a reverse proxy every request comes from the proxy's address, and
+the client's address is in the X-Forwarded-For header, which the client
+can also set.  Only the entries added by the TRUSTED_PROXIES are
+believed: the header is read from the right, skipping trusted proxies,
+and the first other address is the client.
+"""
+from django.conf import settings
+
+
+def client_ip(request):
+    """Return the IP address of the client of a request, or None."""
+    address = request.META.get("REMOTE_ADDR")
+    if address not in settings.TRUSTED_PROXIES:
+        return address
+    forwarded = request.META.get("HTTP_X_FORWARDED_FOR", "")
+    for hop in reversed([hop.strip() for hop in forwarded.split(",")]):
+        if not hop:
+            break
+        address = hop
+        if hop not in settings.TRUSTED_PROXIES:
+            break
+    return address
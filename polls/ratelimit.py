@@ -0,0 +1,99 @@
+"""
+Token-bucket rate limits for the vote endpoint, kept in Django's cache.
+
+Every client has a bucket of `burst` tokens that refills at `rate` tokens
+per second; each vote takes one token and a vote that finds the bucket
+empty is answered with 429 Too Many Requests.  Clients are identified by
+IP address (see polls.proxies.client_ip()) and by the id of the user
+logged in to the session, so the check needs the session but not the
+user.  With the default `db` SESSION_PROFILE that costs one query to read
+the session; the `cached_db` and `signed_cookies` profiles refuse excess
+votes without touching the database.
+
+Reading and writing a bucket is not atomic, so concurrent requests of one
+client may occasionally both take the last token.
+"""
+import functools
+import math
+import time
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from .proxies import client_ip
+
+
+def take_token(key, rate, burst):
+    """
+    Take a token from the bucket `key`.  Returns 0 if a token was taken,
+    or else the number of seconds until the next token is available.
+    """
+    now = time.time()
+    tokens, updated = cache.get(key, (burst, now))
+    tokens = min(burst, tokens + (now - updated) * rate)
+    if tokens < 1:
+        return (1 - tokens) / rate
+    # a bucket left alone for burst/rate seconds is full again anyway
+    cache.set(key, (tokens - 1, now), math.ceil(burst / rate))
+    return 0
+
+
+def session_user(request):
+    """
+    Return the id of the user logged in to the request's session, or None,
+    without loading the user.  Logging in again does not change it.
+    """
+    return request.session.get(SESSION_KEY)
+
+
+def vote_wait(request):
+    """
+    Take a token from the request's per-IP and per-user buckets.
+    Returns the seconds to wait if either is empty, or 0.
+    """
+    limits = [
+        ("ip", client_ip(request),
+         settings.VOTE_IP_RATE, settings.VOTE_IP_BURST),
+        ("user", session_user(request),
+         settings.VOTE_USER_RATE, settings.VOTE_USER_BURST),
+    ]
+    wait = 0
+    for kind, client, rate, burst in limits:
+        if client and rate > 0:
+            wait = max(wait, take_token(f"polls:ratelimit:{kind}:{client}",
+                                        rate, burst))
+    return wait
+
+
+def too_many_votes(wait):
+    """Return the 429 response for a client that must wait `wait` seconds."""
+    response = HttpResponse("Too many votes; please try again later.",
+                            status=429, content_type="text/plain")
+    response["Retry-After"] = str(math.ceil(wait))
+    return response
+
+
+def limit_votes(view):
+    """
+    Decorate a sync or async vote view to answer 429 when the client has
+    voted too often, before the view runs.
+    """
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            # the session may have to be loaded from the database
+            wait = await sync_to_async(vote_wait)(request)
+            if wait:
+                return too_many_votes(wait)
+            return await view(request, *args, **kwargs)
+    else:
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            wait = vote_wait(request)
+            if wait:
+                return too_many_votes(wait)
+            return view(request, *args, **kwargs)
+    return wrapper
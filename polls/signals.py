@@ -0,0 +1,66 @@
+"""Signal handlers for the polls app."""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_in
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .cache import bump_version
+from .models import Choice, Question, QuestionResultSnapshot, Vote
+from .sqlite import apply_pragmas
+from .voting import delete_votes, load_session_votes, results_changed
+
+
+@receiver(pre_delete, sender=User)
+def delete_user_votes(sender, instance, **kwargs):
+    """
+    Take the votes of a user who is deleted off the vote counters before
+    they are deleted along with the user.  Votes deleted along with their
+    question or choice need nothing, so there is no receiver on Vote that
+    would keep Django from deleting them with a single query.
+    """
+    delete_votes(Vote.objects.filter(user=instance), keep_user=False)
+
+
+@receiver(user_logged_in)
+def cache_user_votes(sender, request, user, **kwargs):
+    """Load the votes of a user who logs in into the session."""
+    load_session_votes(request, user)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def question_changed(sender, instance, **kwargs):
+    """Invalidate the cached pages that show the question."""
+    bump_version("questions")
+    bump_version(f"results:{instance.pk}")
+
+
+@receiver(post_save, sender=Question)
+def discard_snapshot(sender, instance, created, **kwargs):
+    """
+    Retake the results snapshot of a question whose dates or text may
+    have changed.
+    """
+    if not created:
+        QuestionResultSnapshot.discard([instance.pk])
+
+
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def choice_changed(sender, instance, **kwargs):
+    """
+    Make results pages and streams reload the choices of the question,
+    and retake its results snapshot.
+    """
+    QuestionResultSnapshot.discard([instance.question_id])
+    results_changed([instance.question_id])
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    """Apply SQLITE_PRAGMAS to every new SQLite connection."""
+    if connection.vendor == "sqlite" and settings.SQLITE_PRAGMAS:
+        with connection.cursor() as cursor:
+            apply_pragmas(cursor, settings.SQLITE_PRAGMAS)
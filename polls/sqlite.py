@@ -0,0 +1,7 @@
+"""Connection tuning for the SQLite database backend."""
+
+
+def apply_pragmas(cursor, pragmas):
+    """Run `PRAGMA name = value` for each item of `pragmas` on a cursor."""
+    for name, value in pragmas.items():
+        cursor.execute(f"PRAGMA {name} = {value}")
@@ -0,0 +1,64 @@
+// Update the results table from the live vote count stream.
+(function () {
+    let table = document.getElementById("results");
+    if (!table || !window.EventSource) {
+        return;
+    }
+    const source = new EventSource(table.dataset.streamUrl);
+
+    // Replace the table with a fresh copy, for added or deleted choices.
+    function reloadTable() {
+        fetch(window.location.href, {credentials: "same-origin"})
+            .then(function (response) { return response.text(); })
+            .then(function (html) {
+                const page = new DOMParser().parseFromString(html, "text/html");
+                const fresh = page.getElementById("results");
+                if (fresh) {
+                    table.replaceWith(fresh);
+                    table = fresh;
+                }
+            });
+    }
+
+    function sameChoices(counts) {
+        const rows = table.querySelectorAll("tbody tr");
+        const ids = Object.keys(counts);
+        return rows.length === ids.length && ids.every(function (choiceId) {
+            return table.querySelector(`tr[data-choice="${choiceId}"]`);
+        });
+    }
+
+    // the first event of each connection has the count of every choice
+    let firstEvent = true;
+    source.addEventListener("open", function () {
+        firstEvent = true;
+    });
+    source.addEventListener("choices", reloadTable);
+    source.addEventListener("votes", function (event) {
+        const counts = JSON.parse(event.data);
+        const complete = firstEvent;
+        firstEvent = false;
+        if (complete && !sameChoices(counts)) {
+            reloadTable();
+            return;
+        }
+        for (const [choiceId, votes] of Object.entries(counts)) {
+            const row = table.querySelector(`tr[data-choice="${choiceId}"]`);
+            if (!row) {
+                reloadTable();
+                return;
+            }
+            row.querySelector(".votes").textContent = votes;
+        }
+        let total = 0;
+        table.querySelectorAll("tbody .votes").forEach(function (cell) {
+            total += parseInt(cell.textContent, 10);
+        });
+        table.querySelector(".total").textContent = total;
+        table.querySelectorAll("tbody tr").forEach(function (row) {
+            const votes = parseInt(row.querySelector(".votes").textContent, 10);
+            const percentage = total ? (100 * votes / total) : 0;
+            row.querySelector(".percentage").textContent = percentage.toFixed(1) + "%";
+        });
+    });
+})();
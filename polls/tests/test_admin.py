@@ -0,0 +1,92 @@
+"""Tests of the admin changelists."""
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from polls.admin import EstimatedCountPaginator
+from polls.models import Question, Choice, Vote
+from polls.voting import apply_votes
+
+
+class AdminChangelistTest(TestCase):
+    """The changelists run a fixed number of queries."""
+    def setUp(self):
+        """Create a question, choices and a logged-in superuser."""
+        super().setUp()
+        self.admin = User.objects.create_superuser(username="admin")
+        self.client.force_login(self.admin)
+        self.question = Question.objects.create(question_text="Admin")
+        self.choices = [Choice.objects.create(question=self.question,
+                                              choice_text=str(n))
+                        for n in range(3)]
+
+    def add_votes(self, count):
+        """Add votes by `count` new users."""
+        start = User.objects.count()
+        users = User.objects.bulk_create(
+            User(username=f"user{n}") for n in range(start, start + count))
+        apply_votes({(user.pk, self.question.pk): self.choices[0].pk
+                     for user in users})
+
+    def count_queries(self, model_name):
+        """Return the number of queries of a changelist."""
+        url = reverse(f"admin:polls_{model_name}_changelist")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_queries_do_not_grow_with_rows(self):
+        """More rows do not mean more queries."""
+        self.add_votes(2)
+        few = {name: self.count_queries(name)
+               for name in ("question", "choice", "vote")}
+        for n in range(5):
+            Question.objects.create(question_text=f"More {n}")
+            Choice.objects.create(question=self.question, choice_text=str(n))
+        self.add_votes(10)
+        many = {name: self.count_queries(name)
+                for name in ("question", "choice", "vote")}
+        self.assertEqual(few, many)
+
+    def test_question_list_shows_total_votes(self):
+        """The question changelist shows the summed vote counters."""
+        self.add_votes(4)
+        response = self.client.get(
+            reverse("admin:polls_question_changelist"))
+        self.assertEqual(response.context["cl"].result_list[0].total_votes, 4)
+
+    def test_votes_are_read_only(self):
+        """Votes can be viewed and deleted in the admin, but not edited."""
+        self.add_votes(1)
+        vote = Vote.objects.get()
+        response = self.client.get(reverse("admin:polls_vote_add"))
+        self.assertEqual(response.status_code, 403)
+        url = reverse("admin:polls_vote_change", args=(vote.pk,))
+        self.client.post(url, {"user": vote.user_id,
+                               "question": vote.question_id,
+                               "choice": self.choices[1].pk})
+        vote.refresh_from_db()
+        self.assertEqual(vote.choice, self.choices[0])
+        self.client.post(reverse("admin:polls_vote_delete", args=(vote.pk,)),
+                         {"post": "yes"})
+        self.choices[0].refresh_from_db()
+        self.assertEqual(self.choices[0].vote_count, 0)
+
+
+class EstimatedCountPaginatorTest(TestCase):
+    """Tests of the estimated-count paginator."""
+    def test_count(self):
+        """Unfiltered counts use the largest id, filtered ones COUNT(*)."""
+        question = Question.objects.create(question_text="Count")
+        choices = [Choice.objects.create(question=question, choice_text="x")
+                   for _ in range(3)]
+        choices[0].delete()
+        paginator = EstimatedCountPaginator(Choice.objects.order_by("id"), 10)
+        with self.assertNumQueries(1):
+            self.assertEqual(paginator.count, choices[2].id)
+        filtered = EstimatedCountPaginator(
+            Choice.objects.filter(question=question).order_by("id"), 10)
+        self.assertEqual(filtered.count, 2)
+
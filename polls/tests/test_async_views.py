@@ -0,0 +1,94 @@
+"""Tests of the async detail, results and vote views."""
+import datetime
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import include, path, reverse
+from django.utils import timezone
+from polls.cache import peek_version
+from polls.models import Question, Choice, QuestionResultSnapshot, Vote
+from polls.voting import cast_vote
+from mysite.views import signup
+
+# the async polls URLconf, as mysite.urls uses with POLLS_ASYNC_VIEWS
+urlpatterns = [
+    path("polls/", include("polls.async_urls")),
+    path("accounts/", include("django.contrib.auth.urls")),
+    path("signup/", signup, name="signup"),
+]
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncViewsTest(TestCase):
+    """Tests of the views in polls.async_views."""
+    def setUp(self):
+        """Create a question with two choices and log in a user."""
+        super().setUp()
+        cache.clear()
+        self.question = Question.objects.create(question_text="Async")
+        self.choice1 = Choice.objects.create(question=self.question,
+                                             choice_text="One")
+        self.choice2 = Choice.objects.create(question=self.question,
+                                             choice_text="Two")
+        self.user = User.objects.create_user(username="voter")
+        self.async_client.force_login(self.user)
+
+    async def test_detail_shows_choices(self):
+        """The detail page lists the choices and marks the user's vote."""
+        response = await self.async_client.get(
+            reverse("polls:detail", args=(self.question.id,)))
+        self.assertContains(response, "One")
+        self.assertContains(response, "Two")
+        self.assertIsNone(response.context["choice_voted"])
+
+    async def test_detail_of_closed_question_redirects(self):
+        """A closed question redirects to the index."""
+        self.question.end_date = timezone.now() - datetime.timedelta(days=1)
+        await self.question.asave()
+        response = await self.async_client.get(
+            reverse("polls:detail", args=(self.question.id,)))
+        self.assertRedirects(response, reverse("polls:index"),
+                             fetch_redirect_response=False)
+
+    async def test_vote_is_saved(self):
+        """A vote is saved and counted."""
+        response = await self.async_client.post(
+            reverse("polls:vote", args=(self.question.id,)),
+            {"choice": self.choice2.id})
+        self.assertRedirects(
+            response, reverse("polls:results", args=(self.question.id,)),
+            fetch_redirect_response=False)
+        vote = await Vote.objects.aget(user=self.user)
+        self.assertEqual(vote.choice_id, self.choice2.id)
+        await self.choice2.arefresh_from_db()
+        self.assertEqual(self.choice2.vote_count, 1)
+
+    async def test_vote_requires_login(self):
+        """Anonymous votes redirect to the login page."""
+        self.async_client.cookies.clear()
+        response = await self.async_client.post(
+            reverse("polls:vote", args=(self.question.id,)),
+            {"choice": self.choice1.id})
+        self.assertEqual(response.status_code, 302)
+        self.assertIn("/accounts/login/", response["Location"])
+        self.assertFalse(await Vote.objects.aexists())
+
+    async def test_results_of_unknown_question(self):
+        """Unknown questions get a 404 and no version stamp."""
+        response = await self.async_client.get(
+            reverse("polls:results", args=(9999,)))
+        self.assertEqual(response.status_code, 404)
+        self.assertIsNone(peek_version("results:9999"))
+
+    def test_results_of_open_and_closed_questions(self):
+        """The results show the counts, from a snapshot once closed."""
+        cast_vote(self.user, self.choice1)
+        url = reverse("polls:results", args=(self.question.id,))
+        response = self.client.get(url)
+        self.assertEqual(response.context["total_votes"], 1)
+        self.question.end_date = timezone.now() - datetime.timedelta(days=1)
+        self.question.save()
+        response = self.client.get(url)
+        self.assertEqual(response.context["total_votes"], 1)
+        self.assertTrue(QuestionResultSnapshot.objects.filter(
+            question=self.question).exists())
@@ -1,5 +1,7 @@
 """Tests of authentication."""
+from unittest import mock
 import django.test
+from django.contrib.auth import SESSION_KEY
 from django.urls import reverse
 from django.contrib.auth.models import User
 from polls.models import Question, Choice
@@ -52,6 +54,30 @@ class UserAuthTest(django.test.TestCase):
         self.assertEqual(response.status_code, 302)
         self.assertRedirects(response, reverse('polls:index'))
 
+    def test_signup_hashes_the_password_once(self):
+        """Signup logs the new user in without checking the password."""
+        form_data = {"username": "newuser",
+                     "password1": "testpassword111",
+                     "password2": "testpassword111"}
+        with mock.patch("django.contrib.auth.base_user.check_password") \
+                as check_password:
+            self.client.post(reverse("signup"), form_data)
+        check_password.assert_not_called()
+        user = User.objects.get(username="newuser")
+        self.assertEqual(int(self.client.session[SESSION_KEY]), user.pk)
+
+    def test_password_is_rehashed_at_login(self):
+        """After PASSWORD_HASHER changes, logging in rehashes the password."""
+        self.assertTrue(self.user1.password.startswith("pbkdf2_sha256$"))
+        with django.test.override_settings(
+                PASSWORD_HASHERS=settings.PASSWORD_HASHER_PROFILES["scrypt"]):
+            self.assertTrue(self.client.login(username=self.username,
+                                              password=self.password))
+        self.user1.refresh_from_db()
+        self.assertTrue(self.user1.password.startswith("scrypt$"))
+        self.assertTrue(self.client.login(username=self.username,
+                                          password=self.password))
+
     def test_logout(self):
         """A user can logout using the logout url.
 
@@ -0,0 +1,103 @@
+"""Tests of the bulk authoring of questions."""
+import json
+import tempfile
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.urls import reverse
+from polls.authoring import create_questions
+from polls.models import Question, Choice
+
+QUESTIONS = [
+    {"question_text": "Tea or coffee?", "choices": ["Tea", "Coffee"]},
+    {"question_text": "Later", "pub_date": "2030-06-01T12:00:00+07:00",
+     "choices": ["Yes", "No", "Maybe"]},
+]
+
+
+class CreateQuestionsTest(TestCase):
+    """Tests of polls.authoring.create_questions()."""
+    def test_questions_and_choices_are_created(self):
+        """Questions and their choices are saved with one insert each."""
+        with self.assertNumQueries(4):
+            # savepoint, two inserts, release
+            created = create_questions(QUESTIONS)
+        self.assertEqual(Question.objects.count(), 2)
+        later = Question.objects.get(question_text="Later")
+        self.assertEqual(later.pub_date.year, 2030)
+        self.assertEqual(
+            list(later.choice_set.values_list("choice_text", flat=True)),
+            ["Yes", "No", "Maybe"])
+        self.assertEqual(created[0][1][0].question_id, created[0][0].id)
+
+    def test_invalid_item_saves_nothing(self):
+        """One invalid question rejects the whole list."""
+        items = QUESTIONS + [{"question_text": "", "choices": ["x" * 201]}]
+        with self.assertRaises(ValidationError) as context:
+            create_questions(items)
+        self.assertIn("2", context.exception.message_dict)
+        self.assertFalse(Question.objects.exists())
+
+
+class BulkCreateViewTest(TestCase):
+    """Tests of the bulk create endpoint."""
+    def setUp(self):
+        """Log in a staff user."""
+        super().setUp()
+        self.user = User.objects.create_user(username="editor", is_staff=True)
+        self.client.force_login(self.user)
+        self.url = reverse("polls:bulk_create_questions")
+
+    def post(self, data):
+        """Post data as a JSON body."""
+        return self.client.post(self.url, data, content_type="application/json")
+
+    def test_create(self):
+        """The endpoint returns the ids of the new objects."""
+        response = self.post(json.dumps(QUESTIONS))
+        self.assertEqual(response.status_code, 201)
+        questions = response.json()["questions"]
+        self.assertEqual(len(questions), 2)
+        self.assertEqual(Choice.objects.filter(
+            question_id=questions[1]["id"]).count(), 3)
+
+    def test_errors(self):
+        """Invalid JSON and invalid questions get 400 with the errors."""
+        self.assertEqual(self.post("{").status_code, 400)
+        response = self.post(json.dumps([{"question": "typo"}]))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("0", response.json()["errors"])
+
+    def test_staff_only(self):
+        """Users who are not staff may not create questions."""
+        self.user.is_staff = False
+        self.user.save()
+        self.assertEqual(self.post(json.dumps(QUESTIONS)).status_code, 403)
+        self.assertFalse(Question.objects.exists())
+
+
+class CreateQuestionsCommandTest(TestCase):
+    """Tests of the create_questions command."""
+    def write_json(self, data):
+        """Write data to a temporary JSON file and return its path."""
+        file = tempfile.NamedTemporaryFile("w", suffix=".json")
+        self.addCleanup(file.close)
+        json.dump(data, file)
+        file.flush()
+        return file.name
+
+    def test_command(self):
+        """The command reads questions from a file."""
+        out = StringIO()
+        call_command("create_questions", self.write_json(QUESTIONS),
+                     stdout=out)
+        self.assertIn("Created 2 questions with 5 choices", out.getvalue())
+
+    def test_invalid_questions(self):
+        """Invalid questions are reported and nothing is saved."""
+        with self.assertRaisesMessage(CommandError, "item 1"):
+            call_command("create_questions",
+                         self.write_json(QUESTIONS[:1] + [{"choices": []}]))
+        self.assertFalse(Question.objects.exists())
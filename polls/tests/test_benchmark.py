@@ -0,0 +1,117 @@
+"""Tests of the benchmark helpers."""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase
+from polls.benchmark import compare_results, percentile, run_http_load
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    """Answers / with a redirect to /done, over keep-alive connections."""
+    protocol_version = "HTTP/1.1"
+    connections = set()
+
+    def do_GET(self):
+        """Redirect / to /done; answer /done with a short body."""
+        self.connections.add(self.client_address)
+        if self.path == "/":
+            self.send_response(302)
+            self.send_header("Location", "/done")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        """Keep the test output quiet."""
+
+
+def make_results(**changes):
+    """Return benchmark results of one scenario with some values changed."""
+    stats = {"requests": 100, "throughput": 100.0, "p50_ms": 10.0,
+             "p95_ms": 20.0, "p99_ms": 30.0, "queries_per_request": 4.0,
+             "writes_per_request": 1.0}
+    stats.update(changes)
+    return {"scenarios": {"vote": stats}}
+
+
+class BenchmarkHelpersTest(SimpleTestCase):
+    """Tests of the benchmark helpers."""
+    def test_percentile(self):
+        """percentile() picks the value at the given rank."""
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.5), 51)
+        self.assertEqual(percentile(values, 0.99), 99)
+        self.assertEqual(percentile([], 0.5), 0.0)
+
+    def test_same_results_do_not_regress(self):
+        """Identical results are not a regression."""
+        self.assertEqual(compare_results(make_results(), make_results(), 0.1),
+                         [])
+
+    def test_latency_within_tolerance(self):
+        """Latency may grow by up to the tolerance."""
+        self.assertEqual(
+            compare_results(make_results(), make_results(p95_ms=21.0), 0.1),
+            [])
+        self.assertEqual(
+            len(compare_results(make_results(), make_results(p95_ms=23.0),
+                                0.1)), 1)
+
+    def test_extra_query_is_a_regression(self):
+        """Any extra query per request is a regression."""
+        regressions = compare_results(
+            make_results(), make_results(queries_per_request=5.0), 0.5)
+        self.assertEqual(len(regressions), 1)
+        self.assertIn("queries_per_request", regressions[0])
+
+    def test_more_threads_than_users(self):
+        """Each thread needs its own user, so --threads is checked first."""
+        with self.assertRaises(CommandError):
+            call_command("benchmark", "--users", "2", "--threads", "4",
+                         stdout=StringIO())
+
+
+class HTTPLoadTest(SimpleTestCase):
+    """Tests of the keep-alive HTTP load generator."""
+    def setUp(self):
+        """Start a local HTTP server."""
+        super().setUp()
+        KeepAliveHandler.connections = set()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def test_requests_reuse_connections(self):
+        """Requests are spread over kept-alive connections and redirects
+        are followed."""
+        url = "http://127.0.0.1:{}".format(self.server.server_address[1])
+        stats = run_http_load(url, lambda worker, n: ("GET", "/", [], b""),
+                              requests=20, connections=4)
+        self.assertEqual(stats["requests"], 20)
+        self.assertEqual(len(KeepAliveHandler.connections), 4)
+
+
+class TemplateBenchmarkTest(SimpleTestCase):
+    """Tests of the template render benchmark."""
+    def test_every_template_renders(self):
+        """Each template is rendered at each size without the database."""
+        out = StringIO()
+        call_command("benchmark_templates", "--sizes", "2", "5",
+                     "--repeat", "1", stdout=out)
+        lines = out.getvalue().splitlines()[1:]
+        self.assertEqual(len(lines), 10)
+
+    def test_max_ms(self):
+        """Renders slower than --max-ms fail the command."""
+        with self.assertRaises(CommandError):
+            call_command("benchmark_templates", "--sizes", "2",
+                         "--repeat", "1", "--template", "detail",
+                         "--max-ms", "0", stdout=StringIO())
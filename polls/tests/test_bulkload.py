@@ -0,0 +1,106 @@
+"""Tests of the bulkload management command."""
+import datetime
+import io
+import json
+import os
+import tempfile
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import TestCase
+from polls.management.commands.bulkload import iter_json_array
+from polls.history import rollup_history
+from polls.models import Question, Choice, Vote, VoteEvent, VoteRollup
+
+FIXTURE = [
+    {"model": "auth.user", "pk": 50, "fields": {
+        "username": "loaded", "password": "!",
+        "date_joined": "2023-09-01T00:00:00Z"}},
+    {"model": "polls.question", "pk": 40, "fields": {
+        "question_text": "Loaded question", "pub_date": "2023-09-01T00:00:00Z",
+        "end_date": None}},
+    {"model": "polls.vote", "pk": 30, "fields": {
+        "user": 50, "question": 40, "choice": 41}},
+    {"model": "polls.choice", "pk": 41, "fields": {
+        "question": 40, "choice_text": "Loaded choice"}},
+]
+
+
+class BulkLoadTest(TestCase):
+    """Tests of the bulkload management command."""
+    def write_file(self, suffix, content):
+        """Write content to a temporary file and return its path."""
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(handle, "w") as file:
+            file.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_iter_json_array_across_chunks(self):
+        """Array items are parsed even when they span several chunks."""
+        stream = io.StringIO(json.dumps(FIXTURE, indent=2))
+        self.assertEqual(list(iter_json_array(stream, chunk_size=7)),
+                         FIXTURE)
+
+    def test_load_json(self):
+        """A JSON fixture is loaded and the vote counters are rebuilt."""
+        path = self.write_file(".json", json.dumps(FIXTURE))
+        call_command("bulkload", path, batch_size=1, verbosity=0)
+        self.assertTrue(User.objects.filter(username="loaded").exists())
+        self.assertEqual(Question.objects.get(pk=40).question_text,
+                         "Loaded question")
+        self.assertEqual(Vote.objects.get(pk=30).choice_id, 41)
+        self.assertEqual(Choice.objects.get(pk=41).votes, 1)
+
+    def test_loaded_votes_join_the_history(self):
+        """Loaded votes are logged and rolled up when they were cast."""
+        fixture = FIXTURE + [
+            {"model": "auth.user", "pk": 51, "fields": {
+                "username": "loaded2", "password": "!",
+                "date_joined": "2023-09-01T00:00:00Z"}},
+            {"model": "polls.vote", "pk": 31, "fields": {
+                "user": 51, "question": 40, "choice": 41,
+                "voted_at": "2023-09-02T10:30:00Z"}},
+        ]
+        fixture[2]["fields"]["voted_at"] = "2023-09-02T10:05:00Z"
+        path = self.write_file(".json", json.dumps(fixture))
+        call_command("bulkload", path, batch_size=1, verbosity=0)
+        self.assertEqual(
+            list(VoteEvent.objects.order_by("user_id").values_list(
+                "user_id", "new_choice_id")), [(50, 41), (51, 41)])
+        self.assertEqual(
+            list(VoteRollup.objects.filter(bucket="hour").values_list(
+                "start", "votes")),
+            [(datetime.datetime(2023, 9, 2, 10,
+                                tzinfo=datetime.timezone.utc), 2)])
+        self.assertEqual(VoteRollup.objects.filter(bucket="minute").count(),
+                         2)
+        history = rollup_history(Question.objects.get(pk=40), "hour", 10)
+        self.assertEqual(history[0][2], {41: 2})
+
+    def test_load_jsonl(self):
+        """A JSONL file has one fixture object per line."""
+        path = self.write_file(
+            ".jsonl", "\n".join(json.dumps(obj) for obj in FIXTURE))
+        call_command("bulkload", path, verbosity=0)
+        self.assertEqual(Vote.objects.count(), 1)
+
+    def test_load_csv(self):
+        """CSV rows are loaded into the model given by --model."""
+        question = Question.objects.create(question_text="CSV question")
+        path = self.write_file(
+            ".csv", f"id,question,choice_text\n1001,{question.pk},Yes\n"
+                    f"1002,{question.pk},No\n")
+        call_command("bulkload", path, model="polls.choice", verbosity=0)
+        self.assertQuerySetEqual(
+            question.choice_set.order_by("id").values_list("choice_text",
+                                                           flat=True),
+            ["Yes", "No"])
+
+    def test_invalid_reference_rolls_back(self):
+        """A row referring to a missing object aborts the whole load."""
+        fixture = FIXTURE[1:]
+        path = self.write_file(".json", json.dumps(fixture))
+        with self.assertRaises(IntegrityError):
+            call_command("bulkload", path, verbosity=0)
+        self.assertFalse(Question.objects.filter(pk=40).exists())
@@ -0,0 +1,70 @@
+"""Tests of exporting results and votes."""
+import csv
+import json
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from polls.models import Question, Choice
+from polls.voting import cast_vote
+
+
+class ExportTest(TestCase):
+    """Tests of exporting results and votes."""
+    def setUp(self):
+        """Create a question with two choices and three votes."""
+        super().setUp()
+        self.question = Question.objects.create(question_text="Export")
+        self.choice1 = Choice.objects.create(question=self.question,
+                                             choice_text="One")
+        self.choice2 = Choice.objects.create(question=self.question,
+                                             choice_text="Two")
+        for n, choice in enumerate([self.choice1, self.choice1,
+                                    self.choice2]):
+            cast_vote(User.objects.create_user(username=f"voter{n}"), choice)
+        self.user = User.objects.create_user(username="reader",
+                                             password="FatChance!")
+        self.client.login(username="reader", password="FatChance!")
+        self.url = reverse("polls:export", args=(self.question.id,))
+
+    def get_lines(self, response):
+        """Return the lines of a streamed response."""
+        return b"".join(response.streaming_content).decode().splitlines()
+
+    def test_export_results_csv(self):
+        """Results are exported as CSV with one row per choice."""
+        response = self.client.get(self.url)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        rows = list(csv.DictReader(self.get_lines(response)))
+        self.assertEqual([(row["choice_text"], row["votes"]) for row in rows],
+                         [("One", "2"), ("Two", "1")])
+
+    def test_export_votes_requires_staff(self):
+        """Only staff can export the raw votes."""
+        response = self.client.get(self.url, {"kind": "votes"})
+        self.assertEqual(response.status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(self.url, {"kind": "votes",
+                                              "format": "jsonl"})
+        votes = [json.loads(line) for line in self.get_lines(response)]
+        self.assertEqual([vote["username"] for vote in votes],
+                         ["voter0", "voter1", "voter2"])
+
+    def test_export_requires_login(self):
+        """Anonymous users are redirected to the login page."""
+        self.client.logout()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+
+    def test_export_command_all_questions(self):
+        """Without a question id the command exports every question."""
+        other = Question.objects.create(question_text="Other")
+        Choice.objects.create(question=other, choice_text="Three")
+        out = StringIO()
+        call_command("export_polls", "--format", "jsonl", stdout=out)
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([(row["choice_text"], row["votes"],
+                           row["question_votes"]) for row in rows],
+                         [("One", 2, 3), ("Two", 1, 3), ("Three", 0, 0)])
@@ -0,0 +1,78 @@
+"""Tests of the request metrics."""
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from polls import metrics
+from polls.models import Question
+
+
+class MetricsTest(TestCase):
+    """Tests of the request metrics."""
+    def series_count(self, histogram, view_name):
+        """Return how many requests a histogram recorded for a view."""
+        prefix = f'{histogram.name}_count{{view="{view_name}"}} '
+        for line in histogram.render():
+            if line.startswith(prefix):
+                return int(line[len(prefix):])
+        return 0
+
+    def test_requests_are_recorded_by_url_name(self):
+        """A request is counted under its URL name."""
+        before = self.series_count(metrics.request_queries, "polls:index")
+        self.client.get(reverse("polls:index"))
+        self.assertEqual(
+            self.series_count(metrics.request_queries, "polls:index"),
+            before + 1)
+
+    def test_metrics_endpoint(self):
+        """/metrics serves the histograms in the Prometheus format."""
+        self.client.get(reverse("polls:index"))
+        response = self.client.get(reverse("metrics"),
+                                   REMOTE_ADDR="127.0.0.1")
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response,
+                            "# TYPE polls_request_duration_seconds histogram")
+        self.assertContains(response, 'view="polls:index",le="+Inf"')
+
+    def test_metrics_endpoint_is_local_only(self):
+        """Clients outside METRICS_ALLOWED_IPS cannot read the metrics."""
+        response = self.client.get(reverse("metrics"),
+                                   REMOTE_ADDR="10.1.2.3")
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(TRUSTED_PROXIES=["127.0.0.1"])
+    def test_metrics_endpoint_behind_proxy(self):
+        """Behind a trusted proxy the forwarded client address is checked."""
+        response = self.client.get(
+            reverse("metrics"), REMOTE_ADDR="127.0.0.1",
+            HTTP_X_FORWARDED_FOR="127.0.0.1, 10.1.2.3")
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(reverse("metrics"), REMOTE_ADDR="127.0.0.1",
+                                   HTTP_X_FORWARDED_FOR="127.0.0.1")
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_TOKEN="s3cret")
+    def test_metrics_token(self):
+        """With METRICS_TOKEN set, only requests with the token get in."""
+        url = reverse("metrics")
+        response = self.client.get(url, REMOTE_ADDR="127.0.0.1")
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(url, REMOTE_ADDR="127.0.0.1",
+                                   HTTP_AUTHORIZATION="Bearer s3cret")
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(QUERY_BUDGET=0)
+    def test_query_budget_is_logged(self):
+        """Requests over the query budget are logged."""
+        question = Question.objects.create(question_text="Budget")
+        with self.assertLogs("polls.middleware", "WARNING") as logs:
+            self.client.get(reverse("polls:results", args=(question.id,)))
+        self.assertIn("budget 0", logs.output[0])
+
+    @override_settings(QUERY_BUDGET=0)
+    async def test_queries_are_counted_under_asgi(self):
+        """The queries of ASGI requests are counted too."""
+        question = await Question.objects.acreate(question_text="ASGI")
+        with self.assertLogs("polls.middleware", "WARNING") as logs:
+            await self.async_client.get(
+                reverse("polls:results", args=(question.id,)))
+        self.assertIn("budget 0", logs.output[0])
@@ -0,0 +1,78 @@
+"""Tests of the cached results and index pages."""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from polls.models import Question, Choice
+from polls.voting import cast_vote
+
+
+class ConditionalResultsTest(TestCase):
+    """Tests of ETag and Last-Modified on the results page."""
+    def setUp(self):
+        """Create a question with one choice."""
+        super().setUp()
+        cache.clear()
+        self.question = Question.objects.create(question_text="Cached")
+        self.choice = Choice.objects.create(question=self.question,
+                                            choice_text="One")
+        self.url = reverse("polls:results", args=(self.question.id,))
+
+    def test_results_have_validators(self):
+        """The results page carries an ETag and a Last-Modified date."""
+        response = self.client.get(self.url)
+        self.assertTrue(response.has_header("ETag"))
+        self.assertTrue(response.has_header("Last-Modified"))
+
+    def test_unchanged_results_return_304(self):
+        """Revalidating unchanged results returns 304 without queries."""
+        etag = self.client.get(self.url)["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_vote_changes_etag(self):
+        """A vote on the question makes cached copies stale."""
+        etag = self.client.get(self.url)["ETag"]
+        user = User.objects.create_user(username="voter")
+        with self.captureOnCommitCallbacks(execute=True):
+            cast_vote(user, self.choice)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["total_votes"], 1)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_pages_with_messages_are_not_revalidated(self):
+        """A page with a flash message to show is always rendered."""
+        User.objects.create_user(username="voter", password="FatChance!")
+        self.client.login(username="voter", password="FatChance!")
+        etag = self.client.get(self.url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("polls:vote", args=(self.question.id,)),
+                {"choice": self.choice.id})
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "has been saved")
+        self.assertFalse(response.has_header("ETag"))
+
+
+class ConditionalIndexTest(TestCase):
+    """Tests of ETag on the index page."""
+    def setUp(self):
+        """Start without a cached question list."""
+        super().setUp()
+        cache.clear()
+
+    def test_unchanged_index_returns_304(self):
+        """The index page is revalidated until a question is saved."""
+        Question.objects.create(question_text="First")
+        etag = self.client.get(reverse("polls:index"))["ETag"]
+        response = self.client.get(reverse("polls:index"),
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Question.objects.create(question_text="Second")
+        response = self.client.get(reverse("polls:index"),
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Second")
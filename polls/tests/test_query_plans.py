@@ -0,0 +1,81 @@
+"""Tests that the hot-path queries are served by indexes."""
+import re
+import unittest
+from io import StringIO
+from urllib.parse import urlencode
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from polls.models import Question, Choice
+
+# a full scan of a table; scans of subqueries are fine
+FULL_SCAN = re.compile(r"^SCAN (?!\(subquery)")
+EXPLAINED = ("SELECT", "UPDATE", "DELETE")
+
+
+@unittest.skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN")
+class QueryPlanTest(TestCase):
+    """
+    Runs EXPLAIN QUERY PLAN for every query of the hot paths and fails on
+    a full table scan.
+    """
+    def setUp(self):
+        """Create a question with choices and log in a staff user."""
+        super().setUp()
+        cache.clear()
+        self.question = Question.objects.create(question_text="Plan")
+        self.choice = Choice.objects.create(question=self.question,
+                                            choice_text="One")
+        Choice.objects.create(question=self.question, choice_text="Two")
+        self.client.force_login(
+            User.objects.create_user(username="planner", is_staff=True))
+
+    def explain(self, sql):
+        """Return the steps of the query plan of an SQL statement."""
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertNoFullScans(self, run):
+        """Assert that no query run by run() scans a whole table."""
+        with CaptureQueriesContext(connection) as queries:
+            run()
+        for query in queries.captured_queries:
+            sql = query["sql"]
+            if not sql.lstrip().upper().startswith(EXPLAINED):
+                continue
+            with self.subTest(sql=sql):
+                plan = self.explain(sql)
+                self.assertFalse(
+                    [step for step in plan if FULL_SCAN.match(step)],
+                    f"full table scan: {plan}")
+
+    def test_pages(self):
+        """The index, detail and results pages use indexes."""
+        for url in (reverse("polls:index"),
+                    reverse("polls:index") + "?" + urlencode(
+                        {"cursor": "2024-01-01T00:00:00+00:00,9"}),
+                    reverse("polls:detail", args=(self.question.id,)),
+                    reverse("polls:results", args=(self.question.id,))):
+            self.assertNoFullScans(lambda: self.client.get(url))
+
+    def test_vote(self):
+        """Voting and changing a vote use indexes."""
+        url = reverse("polls:vote", args=(self.question.id,))
+        self.assertNoFullScans(
+            lambda: self.client.post(url, {"choice": self.choice.id}))
+        other = self.question.choice_set.exclude(pk=self.choice.pk).get()
+        self.assertNoFullScans(
+            lambda: self.client.post(url, {"choice": other.id}))
+
+    def test_exports_and_snapshots(self):
+        """Exporting votes and snapshotting closed questions use indexes."""
+        url = reverse("polls:export", args=(self.question.id,))
+        self.assertNoFullScans(
+            lambda: b"".join(self.client.get(url + "?kind=votes")))
+        self.assertNoFullScans(
+            lambda: call_command("snapshot_results", stdout=StringIO()))
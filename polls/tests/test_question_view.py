@@ -1,11 +1,13 @@
 """Tests of question view."""
 import datetime
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import TestCase
 from django.utils import timezone
 from django.urls import reverse
 
-from polls.models import Question
+from polls.models import Question, Choice
+from polls.voting import cast_vote
 
 
 def create_question(question_text, days):
@@ -22,6 +24,11 @@ class QuestionIndexViewTests(TestCase):
     """
     Tests of the index view of questions.
     """
+    def setUp(self):
+        """Start each test without a cached question list."""
+        super().setUp()
+        cache.clear()
+
     def test_no_questions(self):
         """
         If no questions exist, an appropriate message is displayed.
@@ -78,6 +85,60 @@ class QuestionIndexViewTests(TestCase):
             [question2, question1],
         )
 
+    def test_questions_are_paginated(self):
+        """
+        The index page shows page_size questions and links to the next
+        page, which continues after the last question shown.
+        """
+        questions = [create_question(question_text=f"Question {n}.",
+                                     days=-n - 1)
+                     for n in range(12)]
+        response = self.client.get(reverse("polls:index"))
+        self.assertQuerySetEqual(response.context["latest_question_list"],
+                                 questions[:10])
+        self.assertContains(response, "Older polls")
+        cursor = "{},{}".format(questions[9].pub_date.isoformat(),
+                                questions[9].id)
+        response = self.client.get(reverse("polls:index"),
+                                   {"cursor": cursor})
+        self.assertQuerySetEqual(response.context["latest_question_list"],
+                                 questions[10:])
+        self.assertNotContains(response, "Older polls")
+
+    def test_question_list_is_cached(self):
+        """
+        A second visit is served from the cache without querying questions,
+        until a question is saved.
+        """
+        create_question(question_text="Cached question.", days=-1)
+        self.client.get(reverse("polls:index"))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("polls:index"))
+        self.assertContains(response, "Cached question.")
+        create_question(question_text="New question.", days=-1)
+        response = self.client.get(reverse("polls:index"))
+        self.assertContains(response, "New question.")
+
+    def test_invalid_cursors_share_the_first_page(self):
+        """
+        Invalid cursors are served the cached first page, and equal
+        cursors share one cache entry.
+        """
+        question = create_question(question_text="Cached question.", days=-1)
+        self.client.get(reverse("polls:index"))
+        with self.assertNumQueries(0):
+            self.client.get(reverse("polls:index"), {"cursor": "junk"})
+            self.client.get(reverse("polls:index"), {"cursor": "x,1"})
+        pub_date = question.pub_date.astimezone(datetime.timezone.utc)
+        self.client.get(reverse("polls:index"),
+                        {"cursor": f"{pub_date.isoformat()},{question.id}"})
+        other_offset = pub_date.astimezone(
+            datetime.timezone(datetime.timedelta(hours=2)))
+        with self.assertNumQueries(0):
+            self.client.get(
+                reverse("polls:index"),
+                {"cursor": f"{other_offset.isoformat()},{question.id}"})
+
 
 class QuestionDetailViewTests(TestCase):
     """
@@ -119,3 +180,30 @@ class QuestionDetailViewTests(TestCase):
         url = reverse("polls:detail", args=(past_question.id,))
         response = self.client.get(url)
         self.assertContains(response, past_question.question_text)
+
+    def test_voted_choice_is_selected_by_id(self):
+        """
+        The choice the user voted for is checked, even when another
+        choice has the same text.
+        """
+        question = create_question(question_text="Same text.", days=-1)
+        Choice.objects.create(question=question, choice_text="Same")
+        choice2 = Choice.objects.create(question=question, choice_text="Same")
+        self.client.post(reverse("polls:vote", args=(question.id,)),
+                         {"choice": choice2.id})
+        response = self.client.get(reverse("polls:detail",
+                                           args=(question.id,)))
+        self.assertEqual(response.context["choice_voted"], choice2.id)
+        self.assertContains(response, "checked", count=1)
+        self.assertContains(response, f'value="{choice2.id}" checked')
+
+    def test_votes_are_loaded_at_login(self):
+        """Votes saved before logging in are shown on the detail page."""
+        question = create_question(question_text="Earlier vote.", days=-1)
+        choice = Choice.objects.create(question=question, choice_text="A")
+        cast_vote(self.user_test, choice)
+        self.client.logout()
+        self.client.login(username=self.username, password=self.password)
+        response = self.client.get(reverse("polls:detail",
+                                           args=(question.id,)))
+        self.assertEqual(response.context["choice_voted"], choice.id)
@@ -0,0 +1,129 @@
+"""Tests of the vote rate limits and repeated votes."""
+from unittest import mock
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from polls.models import Question, Choice, Vote
+from polls.ratelimit import take_token
+from polls.voting import cast_vote
+
+
+class TokenBucketTest(TestCase):
+    """Tests of the cache-backed token bucket."""
+    def setUp(self):
+        """Start with empty buckets."""
+        super().setUp()
+        cache.clear()
+
+    def test_burst_then_refill(self):
+        """A bucket allows `burst` tokens, then refills at `rate`."""
+        with mock.patch("polls.ratelimit.time.time", return_value=1000.0):
+            for _ in range(3):
+                self.assertEqual(take_token("bucket", 1.0, 3), 0)
+            self.assertAlmostEqual(take_token("bucket", 1.0, 3), 1.0)
+        with mock.patch("polls.ratelimit.time.time", return_value=1001.0):
+            self.assertEqual(take_token("bucket", 1.0, 3), 0)
+            self.assertGreater(take_token("bucket", 1.0, 3), 0)
+
+
+@override_settings(VOTE_USER_RATE=1.0, VOTE_USER_BURST=2,
+                   VOTE_IP_RATE=0, VOTE_IP_BURST=0)
+class VoteRateLimitTest(TestCase):
+    """Tests of the limits on the vote endpoint."""
+    def setUp(self):
+        """Create a question with two choices and log in a user."""
+        super().setUp()
+        cache.clear()
+        self.question = Question.objects.create(question_text="Limited")
+        self.choice1 = Choice.objects.create(question=self.question,
+                                             choice_text="One")
+        self.choice2 = Choice.objects.create(question=self.question,
+                                             choice_text="Two")
+        self.client.force_login(User.objects.create_user(username="voter"))
+        self.url = reverse("polls:vote", args=(self.question.id,))
+
+    def test_excess_votes_get_429_after_reading_the_session(self):
+        """Votes beyond the burst are refused after reading the session."""
+        self.client.post(self.url, {"choice": self.choice1.id})
+        self.client.post(self.url, {"choice": self.choice2.id})
+        with self.assertNumQueries(1):
+            response = self.client.post(self.url, {"choice": self.choice1.id})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertEqual(Vote.objects.get().choice, self.choice2)
+
+    def test_excess_votes_get_429_without_queries(self):
+        """Sessions kept out of the database make a refusal query-free."""
+        for profile in ("cached_db", "signed_cookies"):
+            with self.subTest(profile=profile), \
+                    override_settings(**settings.SESSION_PROFILES[profile]):
+                cache.clear()
+                # a new client, whose middleware uses the session engine
+                self.client = self.client_class()
+                self.client.force_login(User.objects.get(username="voter"))
+                self.client.post(self.url, {"choice": self.choice1.id})
+                self.client.post(self.url, {"choice": self.choice2.id})
+                with self.assertNumQueries(0):
+                    response = self.client.post(self.url,
+                                                {"choice": self.choice1.id})
+                self.assertEqual(response.status_code, 429)
+
+    def test_logging_in_again_keeps_the_bucket(self):
+        """The per-user bucket follows the user, not the session."""
+        self.client.post(self.url, {"choice": self.choice1.id})
+        self.client.post(self.url, {"choice": self.choice2.id})
+        self.client.force_login(User.objects.get(username="voter"))
+        response = self.client.post(self.url, {"choice": self.choice1.id})
+        self.assertEqual(response.status_code, 429)
+
+    @override_settings(VOTE_USER_RATE=0, VOTE_IP_RATE=1.0, VOTE_IP_BURST=1)
+    def test_limit_per_ip_address(self):
+        """Votes from one address share a bucket."""
+        self.client.post(self.url, {"choice": self.choice1.id})
+        response = self.client.post(self.url, {"choice": self.choice2.id})
+        self.assertEqual(response.status_code, 429)
+
+    @override_settings(VOTE_USER_RATE=0, VOTE_IP_RATE=1.0, VOTE_IP_BURST=1,
+                       TRUSTED_PROXIES=["127.0.0.1"])
+    def test_limit_per_forwarded_address(self):
+        """Behind a trusted proxy each forwarded address has a bucket."""
+        for address in ("10.0.0.1", "10.0.0.2"):
+            response = self.client.post(self.url, {"choice": self.choice1.id},
+                                        REMOTE_ADDR="127.0.0.1",
+                                        HTTP_X_FORWARDED_FOR=address)
+            self.assertEqual(response.status_code, 302)
+        response = self.client.post(self.url, {"choice": self.choice2.id},
+                                    REMOTE_ADDR="127.0.0.1",
+                                    HTTP_X_FORWARDED_FOR="10.0.0.1")
+        self.assertEqual(response.status_code, 429)
+
+    def test_repeated_choice_is_not_saved_again(self):
+        """Submitting the current choice again writes nothing."""
+        self.client.post(self.url, {"choice": self.choice1.id})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {"choice": self.choice1.id})
+        self.assertFalse([query for query in queries.captured_queries
+                          if not query["sql"].startswith(("SELECT",
+                                                          "SAVEPOINT",
+                                                          "RELEASE"))
+                          and "django_session" not in query["sql"]])
+        self.assertRedirects(
+            response, reverse("polls:results", args=(self.question.id,)),
+            fetch_redirect_response=False)
+        self.choice1.refresh_from_db()
+        self.assertEqual(self.choice1.vote_count, 1)
+
+    def test_repeated_choice_checks_the_saved_vote(self):
+        """
+        Resubmitting a choice that the session remembers, after the vote
+        was changed elsewhere, saves it again.
+        """
+        self.client.post(self.url, {"choice": self.choice1.id})
+        # the user changed their vote on another device
+        cast_vote(User.objects.get(username="voter"), self.choice2)
+        self.client.post(self.url, {"choice": self.choice1.id})
+        self.assertEqual(Vote.objects.get().choice, self.choice1)
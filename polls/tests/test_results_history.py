@@ -0,0 +1,167 @@
+"""Tests of the vote rollups and the results history endpoint."""
+import datetime
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from polls.cache import peek_version
+from polls.models import Question, Choice, Vote, VoteRollup
+from polls.voting import cast_vote, delete_votes
+
+START = datetime.datetime(2024, 5, 1, 10, tzinfo=datetime.timezone.utc)
+
+
+def at(minutes):
+    """Freeze the time of the votes cast inside the block."""
+    return mock.patch("django.utils.timezone.now",
+                      return_value=START + datetime.timedelta(
+                          minutes=minutes))
+
+
+class ResultsHistoryTest(TestCase):
+    """Tests of the vote rollups and the results history endpoint."""
+    def setUp(self):
+        """Create a question with two choices and three users."""
+        super().setUp()
+        cache.clear()
+        self.question = Question.objects.create(question_text="Trend")
+        self.one = Choice.objects.create(question=self.question,
+                                         choice_text="One")
+        self.two = Choice.objects.create(question=self.question,
+                                         choice_text="Two")
+        self.users = [User.objects.create_user(username=f"user{n}")
+                      for n in range(3)]
+        self.url = reverse("polls:results_history", args=(self.question.id,))
+
+    def vote(self, minutes, user, choice):
+        with at(minutes), self.captureOnCommitCallbacks(execute=True):
+            cast_vote(self.users[user], choice)
+
+    def history(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return [(bucket["start"], bucket["votes"], bucket["totals"])
+                for bucket in response.json()["buckets"]]
+
+    def test_hour_buckets(self):
+        """Each hour with votes has the change and totals of each choice."""
+        one, two = str(self.one.id), str(self.two.id)
+        self.vote(5, 0, self.one)
+        self.vote(10, 1, self.one)
+        self.vote(70, 0, self.two)
+        self.vote(130, 2, self.two)
+        self.assertEqual(self.history(), [
+            ("2024-05-01T10:00:00+00:00", {one: 2}, {one: 2, two: 0}),
+            ("2024-05-01T11:00:00+00:00", {one: -1, two: 1},
+             {one: 1, two: 1}),
+            ("2024-05-01T12:00:00+00:00", {two: 1}, {one: 1, two: 2}),
+        ])
+        self.assertEqual(len(self.history(bucket="minute")), 4)
+        self.assertEqual(self.history(bucket="day"), [
+            ("2024-05-01T00:00:00+00:00", {one: 1, two: 2},
+             {one: 1, two: 2}),
+        ])
+        # the last buckets only, with the same totals
+        self.assertEqual(self.history(limit=1), self.history()[-1:])
+
+    def test_vote_time_and_deleted_vote(self):
+        """A vote records when it changed; deleting it is rolled up now."""
+        one, two = str(self.one.id), str(self.two.id)
+        self.vote(5, 0, self.one)
+        self.vote(70, 0, self.two)
+        vote = Vote.objects.get(user=self.users[0])
+        self.assertEqual(vote.voted_at, START + datetime.timedelta(minutes=70))
+        with self.captureOnCommitCallbacks(execute=True):
+            delete_votes(Vote.objects.filter(pk=vote.pk))
+        history = self.history()
+        self.assertEqual(len(history), 3)
+        self.assertEqual(history[1][2], {one: 0, two: 1})
+        self.assertEqual(history[2][1:], ({two: -1}, {one: 0, two: 0}))
+
+    def test_rollup_writes(self):
+        """A vote in a bucket that has votes updates all its rollups at once."""
+        self.vote(5, 0, self.one)
+        with at(5), self.assertNumQueries(8):
+            # the savepoint, lock, insert vote, insert event, add to the
+            # counter, add to the rollups, drop snapshots of closed
+            # questions and release
+            cast_vote(self.users[1], self.one)
+        self.vote(6, 2, self.one)
+        self.assertEqual(
+            sorted(VoteRollup.objects.values_list("bucket", "votes")),
+            [("day", 3), ("hour", 3), ("minute", 1), ("minute", 2)])
+
+    def test_query_count_independent_of_votes(self):
+        """The endpoint reads the same rows however many votes there are."""
+        self.vote(5, 0, self.one)
+        with self.assertNumQueries(5):
+            self.history()
+        for n in range(20):
+            self.vote(6, 1, self.two if n % 2 else self.one)
+        with self.assertNumQueries(5):
+            self.history()
+        # cached until the next vote
+        with self.assertNumQueries(0):
+            self.history()
+
+    def test_invalid_requests(self):
+        """Unknown buckets, bad limits and questions are rejected."""
+        for params in ({"bucket": "week"}, {"limit": "x"}, {"limit": 0}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 400)
+        response = self.client.get(
+            reverse("polls:results_history", args=(self.question.id + 1,)))
+        self.assertEqual(response.status_code, 404)
+        self.assertIsNone(peek_version(f"results:{self.question.id + 1}"))
+
+
+class RollupMigrationTest(TransactionTestCase):
+    """Tests of the rollups built by migration 0010 from the event log."""
+    before = [("polls", "0009_vote_events")]
+    after = [("polls", "0010_vote_rollups")]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        self.migrate(executor.loader.graph.leaf_nodes())
+        super().tearDown()
+
+    def test_history_follows_the_event_log(self):
+        """
+        Votes before the log are counted at its first checkpoint, logged
+        votes at their own time, and votes get the time of their last event.
+        """
+        apps = self.migrate(self.before)
+        models = {name: apps.get_model("polls", name) for name in (
+            "Question", "Choice", "Vote", "VoteEvent", "VoteCheckpoint")}
+        user = apps.get_model("auth", "User").objects.create(username="old")
+        question = models["Question"].objects.create(
+            question_text="Old", pub_date=START)
+        one = models["Choice"].objects.create(question=question,
+                                              choice_text="One", vote_count=2)
+        two = models["Choice"].objects.create(question=question,
+                                              choice_text="Two", vote_count=0)
+        models["VoteCheckpoint"].objects.create(
+            question=question, choice=one, at=START, vote_count=1)
+        voted = START + datetime.timedelta(hours=1)
+        models["VoteEvent"].objects.create(
+            question=question, user=user, new_choice=one, timestamp=voted)
+        models["Vote"].objects.create(user=user, question=question,
+                                      choice=one)
+
+        self.migrate(self.after)
+        rollups = VoteRollup.objects.filter(bucket="hour").order_by("start")
+        self.assertEqual(
+            list(rollups.values_list("start", "choice_id", "votes")),
+            [(START - datetime.timedelta(hours=1), one.id, 1),
+             (START + datetime.timedelta(hours=1), one.id, 1)])
+        self.assertEqual(Vote.objects.get().voted_at, voted)
+        self.assertFalse(VoteRollup.objects.filter(choice_id=two.id).exists())
@@ -0,0 +1,115 @@
+"""Tests of the live results stream."""
+import json
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from polls.broadcast import ResultsBroadcaster, broadcaster
+from polls.models import Question, Choice
+from polls.views import _results_events
+from polls.voting import cast_vote
+
+
+def parse_events(content):
+    """Return the data of each `votes` event in an event stream."""
+    return [json.loads(block.split("data: ", 1)[1])
+            for block in content.decode().split("\n\n")
+            if block.startswith("event: votes")]
+
+
+class ResultsBroadcasterTest(TestCase):
+    """Tests of the vote count broadcaster."""
+    def setUp(self):
+        """Create a question with two choices and a broadcaster."""
+        super().setUp()
+        self.question = Question.objects.create(question_text="Live")
+        self.choice1 = Choice.objects.create(question=self.question,
+                                             choice_text="One")
+        self.choice2 = Choice.objects.create(question=self.question,
+                                             choice_text="Two")
+        self.broadcaster = ResultsBroadcaster()
+        self.get_counts = async_to_sync(self.broadcaster.get_counts)
+
+    def test_counts_are_shared_until_published(self):
+        """Subscribers share one query until the question changes."""
+        with self.assertNumQueries(1):
+            for _ in range(5):
+                version, counts = self.get_counts(self.question.id)
+        self.assertEqual(counts, {self.choice1.id: 0, self.choice2.id: 0})
+        Choice.objects.filter(pk=self.choice1.pk).update(vote_count=3)
+        self.broadcaster.publish([self.question.id])
+        with self.assertNumQueries(1):
+            new_version, counts = self.get_counts(self.question.id)
+        self.assertNotEqual(new_version, version)
+        self.assertEqual(counts[self.choice1.id], 3)
+
+    def test_votes_are_published_on_commit(self):
+        """Saving a vote publishes its question after the commit."""
+        version = broadcaster.version(self.question.id)
+        user = User.objects.create_user(username="voter")
+        with self.captureOnCommitCallbacks(execute=True):
+            cast_vote(user, self.choice1)
+        self.assertEqual(broadcaster.version(self.question.id), version + 1)
+
+
+@override_settings(RESULTS_STREAM_INTERVAL=0.01, RESULTS_STREAM_TIMEOUT=0.03,
+                   POLLS_ASYNC_VIEWS=True)
+class ResultsStreamViewTest(TestCase):
+    """Tests of the results stream endpoint."""
+    def setUp(self):
+        """Create a question with one choice."""
+        super().setUp()
+        self.question = Question.objects.create(question_text="Live")
+        self.choice = Choice.objects.create(question=self.question,
+                                            choice_text="One",
+                                            vote_count=2)
+
+    async def test_stream_sends_counts(self):
+        """The stream starts with the count of every choice."""
+        response = await self.async_client.get(
+            reverse("polls:results_stream", args=(self.question.id,)))
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        content = b"".join([chunk async for chunk in
+                            response.streaming_content])
+        self.assertEqual(parse_events(content),
+                         [{str(self.choice.id): 2}])
+
+    async def test_stream_unknown_question(self):
+        """Streaming a question that does not exist returns 404."""
+        response = await self.async_client.get(
+            reverse("polls:results_stream", args=(9999,)))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_added_choice_sends_all_counts(self):
+        """Adding a choice sends a choices event with every count."""
+        events = _results_events(self.question.id)
+        self.assertTrue((await anext(events)).startswith("retry:"))
+        self.assertIn("event: votes", await anext(events))
+        choice = await Choice.objects.acreate(question=self.question,
+                                              choice_text="Two")
+        # the signal publishes the question once the choice is committed
+        broadcaster.publish([self.question.id])
+        block = await anext(events)
+        self.assertTrue(block.startswith("event: choices"))
+        self.assertEqual(json.loads(block.split("data: ", 1)[1]),
+                         {str(self.choice.id): 2, str(choice.id): 0})
+        await events.aclose()
+
+    @override_settings(POLLS_ASYNC_VIEWS=False)
+    async def test_no_stream_under_wsgi(self):
+        """
+        Without the async views the stream answers 204 and the results
+        page leaves out the live results script.
+        """
+        response = await self.async_client.get(
+            reverse("polls:results_stream", args=(self.question.id,)))
+        self.assertEqual(response.status_code, 204)
+        response = await sync_to_async(self.client.get)(
+            reverse("polls:results", args=(self.question.id,)))
+        self.assertNotContains(response, "live-results.js")
+
+    def test_results_page_loads_script(self):
+        """With the async views the results page loads the live script."""
+        response = self.client.get(
+            reverse("polls:results", args=(self.question.id,)))
+        self.assertContains(response, "live-results.js")
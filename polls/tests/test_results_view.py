@@ -0,0 +1,77 @@
+"""Tests of the results view."""
+import time
+from unittest import mock
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from polls.cache import peek_version
+from polls.models import Question, Choice
+from polls.voting import cast_vote
+
+
+class ResultsViewTest(TestCase):
+    """Tests of the results view."""
+    def setUp(self):
+        """Create a question with several choices and some votes."""
+        super().setUp()
+        self.question = Question.objects.create(question_text="Results")
+        self.choices = [
+            Choice.objects.create(question=self.question,
+                                  choice_text=f"Choice {n}")
+            for n in range(10)
+        ]
+        for n in range(4):
+            user = User.objects.create_user(username=f"user{n}")
+            cast_vote(user, self.choices[n % 2])
+
+    def test_results_percentages(self):
+        """Each choice shows its vote count and share of the total."""
+        response = self.client.get(
+            reverse("polls:results", args=(self.question.id,)))
+        choices = response.context["choices"]
+        self.assertEqual(response.context["total_votes"], 4)
+        self.assertEqual([c.vote_count for c in choices[:3]], [2, 2, 0])
+        self.assertEqual([c.percentage for c in choices[:3]], [50, 50, 0])
+        self.assertContains(response, "50.0%")
+
+    def test_results_query_count(self):
+        """The results page needs the same queries however many choices."""
+        url = reverse("polls:results", args=(self.question.id,))
+        with self.assertNumQueries(2):
+            self.client.get(url)
+        for n in range(10):
+            Choice.objects.create(question=self.question,
+                                  choice_text=f"More {n}")
+        with self.assertNumQueries(2):
+            self.client.get(url)
+
+    @override_settings(RESULTS_CACHE_TIMEOUT=60)
+    def test_results_table_expires(self):
+        """
+        Votes saved by another process show up once the cached table runs
+        out, even if this process never saw their version stamp.
+        """
+        url = reverse("polls:results", args=(self.question.id,))
+        self.client.get(url)
+        Choice.objects.filter(pk=self.choices[2].pk).update(vote_count=4)
+        self.assertEqual(self.client.get(url).context["fragment"].count(
+            "50.0%"), 2)
+        later = time.time() + 61
+        with mock.patch("time.time", return_value=later):
+            response = self.client.get(url)
+        self.assertContains(response, "25.0%", count=2)
+
+    def test_results_of_unknown_question(self):
+        """Unknown questions get a 404 and no version stamp."""
+        response = self.client.get(reverse("polls:results", args=(9999,)))
+        self.assertEqual(response.status_code, 404)
+        self.assertIsNone(peek_version("results:9999"))
+
+    def test_results_no_votes(self):
+        """A question without votes shows zero percent for every choice."""
+        question = Question.objects.create(question_text="Empty")
+        Choice.objects.create(question=question, choice_text="Only")
+        response = self.client.get(
+            reverse("polls:results", args=(question.id,)))
+        self.assertEqual(response.context["total_votes"], 0)
+        self.assertEqual(response.context["choices"][0].percentage, 0)
@@ -0,0 +1,64 @@
+"""Tests of the session profiles and purging expired sessions."""
+import datetime
+from io import StringIO
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from polls.models import Question, Choice, Vote
+
+
+@override_settings(**settings.SESSION_PROFILES["signed_cookies"])
+class SignedCookieSessionTest(TestCase):
+    """Voting with sessions and messages kept in signed cookies."""
+    def setUp(self):
+        """Create a question and log in a user."""
+        super().setUp()
+        cache.clear()
+        self.question = Question.objects.create(question_text="Cookies")
+        self.choice = Choice.objects.create(question=self.question,
+                                            choice_text="One")
+        self.user = User.objects.create_user(username="voter")
+        self.client.force_login(self.user)
+        self.url = reverse("polls:vote", args=(self.question.id,))
+
+    def test_vote_without_session_queries(self):
+        """A vote and its message never touch the session table."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {"choice": self.choice.id},
+                                        follow=True)
+        self.assertContains(response, "has been saved")
+        self.assertTrue(Vote.objects.filter(user=self.user).exists())
+        self.assertFalse([query for query in queries.captured_queries
+                          if "django_session" in query["sql"]])
+
+    @override_settings(VOTE_USER_RATE=1.0, VOTE_USER_BURST=1, VOTE_IP_RATE=0)
+    def test_rate_limit_follows_the_user(self):
+        """The user's bucket does not reset when the cookie changes."""
+        self.client.post(self.url, {"choice": self.choice.id})
+        response = self.client.post(self.url, {"choice": self.choice.id})
+        self.assertEqual(response.status_code, 429)
+
+
+class PurgeSessionsTest(TestCase):
+    """Tests of the purge_sessions command."""
+    def test_only_expired_sessions_are_deleted(self):
+        """Expired sessions are deleted in batches; others are kept."""
+        now = timezone.now()
+        Session.objects.bulk_create(
+            Session(session_key=f"old{n}", session_data="",
+                    expire_date=now - datetime.timedelta(days=1))
+            for n in range(5))
+        Session.objects.create(session_key="current", session_data="",
+                               expire_date=now + datetime.timedelta(days=1))
+        out = StringIO()
+        call_command("purge_sessions", "--batch-size", "2", stdout=out)
+        self.assertIn("Deleted 5 expired session(s)", out.getvalue())
+        self.assertEqual(list(Session.objects.values_list("pk", flat=True)),
+                         ["current"])
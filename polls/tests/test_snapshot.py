@@ -0,0 +1,84 @@
+"""Tests of the results snapshots of closed questions."""
+import datetime
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from polls.cache import bump_version
+from polls.models import Question, Choice, QuestionResultSnapshot
+from polls.voting import cast_vote
+
+
+class ResultSnapshotTest(TestCase):
+    """Tests of the results snapshots of closed questions."""
+    def setUp(self):
+        """Create a closed question with two choices."""
+        super().setUp()
+        now = timezone.now()
+        self.question = Question.objects.create(
+            question_text="Closed", pub_date=now - datetime.timedelta(days=2),
+            end_date=now - datetime.timedelta(days=1))
+        Choice.objects.create(question=self.question, choice_text="One",
+                              vote_count=3)
+        Choice.objects.create(question=self.question, choice_text="Two",
+                              vote_count=1)
+        self.url = reverse("polls:results", args=(self.question.id,))
+
+    def test_first_results_request_takes_snapshot(self):
+        """The results of a closed question are frozen on first view."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.context["total_votes"], 4)
+        snapshot = QuestionResultSnapshot.objects.get(question=self.question)
+        self.assertEqual([c["votes"] for c in snapshot.choices], [3, 1])
+
+    def test_snapshot_is_served_with_one_query(self):
+        """Once frozen, results need one query and ignore later changes."""
+        self.client.get(self.url)
+        Choice.objects.filter(question=self.question).update(vote_count=9)
+        # skip the cached results table
+        bump_version(f"results:{self.question.id}")
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual([c.vote_count for c in response.context["choices"]],
+                         [3, 1])
+        self.assertEqual(response.context["choices"][0].percentage, 75)
+
+    def test_snapshot_is_retaken_after_changes(self):
+        """
+        Moving the end date, editing a choice or writing a vote discards
+        the snapshot, and the next results request takes it again.
+        """
+        self.client.get(self.url)
+        self.question.end_date -= datetime.timedelta(hours=1)
+        self.question.save()
+        self.assertFalse(QuestionResultSnapshot.objects.exists())
+        self.client.get(self.url)
+        choice = Choice.objects.get(choice_text="Two")
+        choice.choice_text = "Deux"
+        with self.captureOnCommitCallbacks(execute=True):
+            choice.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.context["choices"][1].choice_text, "Deux")
+        # e.g. a buffered vote flushed after the question closed
+        user = User.objects.create_user(username="late")
+        with self.captureOnCommitCallbacks(execute=True):
+            cast_vote(user, choice)
+        response = self.client.get(self.url)
+        self.assertEqual(response.context["total_votes"], 5)
+
+    def test_open_question_has_no_snapshot(self):
+        """Questions that are still open are counted live."""
+        question = Question.objects.create(question_text="Open")
+        self.client.get(reverse("polls:results", args=(question.id,)))
+        self.assertFalse(
+            QuestionResultSnapshot.objects.filter(question=question).exists())
+
+    def test_snapshot_command(self):
+        """snapshot_results freezes closed questions without a snapshot."""
+        out = StringIO()
+        call_command("snapshot_results", stdout=out)
+        self.assertIn("Saved 1 snapshot", out.getvalue())
+        call_command("snapshot_results", stdout=out)
+        self.assertIn("Saved 0 snapshot", out.getvalue())
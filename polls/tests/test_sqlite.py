@@ -0,0 +1,95 @@
+"""Tests of the production SQLite profile."""
+import os
+import sqlite3
+import tempfile
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import SimpleTestCase
+from mysite.sqlite3.base import DatabaseWrapper as ImmediateDatabaseWrapper
+from polls.sqlite import apply_pragmas
+
+PRODUCTION_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 0,
+}
+
+
+class SQLiteConcurrencyTest(SimpleTestCase):
+    """Tests that vote writers do not block readers."""
+    def setUp(self):
+        """Create a database file with a vote table."""
+        super().setUp()
+        handle, self.path = tempfile.mkstemp(suffix=".sqlite3")
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+        for suffix in ("-wal", "-shm"):
+            self.addCleanup(
+                lambda p=self.path + suffix: os.path.exists(p) and os.remove(p))
+        db = sqlite3.connect(self.path)
+        db.execute("CREATE TABLE vote (id INTEGER PRIMARY KEY, choice INT)")
+        db.execute("INSERT INTO vote (choice) VALUES (1)")
+        db.commit()
+        db.close()
+
+    def connect(self, pragmas):
+        """Open a connection that fails at once instead of waiting."""
+        db = sqlite3.connect(self.path, timeout=0, isolation_level=None)
+        apply_pragmas(db.cursor(), pragmas)
+        self.addCleanup(db.close)
+        return db
+
+    def start_writer(self, pragmas):
+        """Begin a write transaction that holds its lock until rollback."""
+        writer = self.connect(pragmas)
+        writer.execute("BEGIN EXCLUSIVE")
+        writer.execute("INSERT INTO vote (choice) VALUES (2)")
+        self.addCleanup(writer.execute, "ROLLBACK")
+        return writer
+
+    def test_pragmas_are_applied(self):
+        """apply_pragmas switches the database to WAL mode."""
+        db = self.connect(PRODUCTION_PRAGMAS)
+        mode = db.execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(mode.lower(), "wal")
+
+    def test_rollback_journal_blocks_readers(self):
+        """Without the profile a writer locks readers out."""
+        self.start_writer({})
+        reader = self.connect({})
+        with self.assertRaises(sqlite3.OperationalError):
+            reader.execute("SELECT COUNT(*) FROM vote").fetchone()
+
+    def test_wal_readers_not_blocked(self):
+        """With the profile readers see committed data during a write."""
+        self.start_writer(PRODUCTION_PRAGMAS)
+        reader = self.connect(PRODUCTION_PRAGMAS)
+        count = reader.execute("SELECT COUNT(*) FROM vote").fetchone()[0]
+        self.assertEqual(count, 1)
+
+    def begin_transaction(self, wrapper_class):
+        """Begin a transaction the way atomic() does, with a Django backend."""
+        wrapper = wrapper_class({**connection.settings_dict,
+                                 "NAME": self.path})
+        wrapper.set_autocommit(
+            False, force_begin_transaction_with_broken_autocommit=True)
+        self.addCleanup(wrapper.close)
+        self.addCleanup(wrapper.rollback)
+        return wrapper
+
+    def test_deferred_transaction_leaves_write_lock(self):
+        """With the stock backend a transaction takes no lock until used."""
+        self.begin_transaction(DatabaseWrapper)
+        other = self.connect({})
+        other.execute("BEGIN IMMEDIATE")
+        other.execute("ROLLBACK")
+
+    def test_immediate_transaction_takes_write_lock(self):
+        """
+        With the production backend a transaction holds the write lock
+        from its start, so other writers wait instead of failing later.
+        """
+        self.begin_transaction(ImmediateDatabaseWrapper)
+        other = self.connect({})
+        with self.assertRaises(sqlite3.OperationalError):
+            other.execute("BEGIN IMMEDIATE")
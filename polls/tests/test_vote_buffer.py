@@ -0,0 +1,86 @@
+"""Tests of buffered vote ingestion."""
+from unittest import mock
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from polls.buffer import VoteBuffer
+from polls.models import Question, Choice, Vote
+
+
+class VoteBufferTest(TestCase):
+    """Tests of buffered vote ingestion."""
+    def setUp(self):
+        """Create two users and a question with two choices."""
+        super().setUp()
+        self.user1 = User.objects.create_user(username="voter1")
+        self.user2 = User.objects.create_user(username="voter2")
+        self.question = Question.objects.create(question_text="Buffered")
+        self.choice1 = Choice.objects.create(question=self.question,
+                                             choice_text="One")
+        self.choice2 = Choice.objects.create(question=self.question,
+                                             choice_text="Two")
+        self.buffer = VoteBuffer(interval=60, max_size=100, background=False)
+
+    def test_votes_wait_for_flush(self):
+        """Queued votes are not written until the buffer is flushed."""
+        self.buffer.add(self.user1.pk, self.question.pk, self.choice1.pk)
+        self.assertEqual(Vote.objects.count(), 0)
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(Vote.objects.count(), 1)
+        self.assertEqual(len(self.buffer), 0)
+
+    def test_flush_keeps_latest_vote_per_question(self):
+        """Only the latest queued vote of a user on a question is written."""
+        self.buffer.add(self.user1.pk, self.question.pk, self.choice1.pk)
+        self.buffer.add(self.user1.pk, self.question.pk, self.choice2.pk)
+        self.buffer.add(self.user2.pk, self.question.pk, self.choice2.pk)
+        self.assertEqual(self.buffer.flush(), 2)
+        self.choice1.refresh_from_db()
+        self.choice2.refresh_from_db()
+        self.assertEqual(self.choice1.votes, 0)
+        self.assertEqual(self.choice2.votes, 2)
+
+    def test_flush_moves_existing_votes(self):
+        """A buffered vote replaces the user's saved vote."""
+        self.buffer.add(self.user1.pk, self.question.pk, self.choice1.pk)
+        self.buffer.flush()
+        self.buffer.add(self.user1.pk, self.question.pk, self.choice2.pk)
+        self.buffer.flush()
+        vote = Vote.objects.get(user=self.user1)
+        self.assertEqual(vote.choice, self.choice2)
+        self.choice1.refresh_from_db()
+        self.assertEqual(self.choice1.votes, 0)
+
+    def test_full_buffer_is_flushed(self):
+        """The buffer is written as soon as it reaches max_size."""
+        buffer = VoteBuffer(interval=60, max_size=2, background=False)
+        buffer.add(self.user1.pk, self.question.pk, self.choice1.pk)
+        self.assertEqual(Vote.objects.count(), 0)
+        buffer.add(self.user2.pk, self.question.pk, self.choice1.pk)
+        self.assertEqual(Vote.objects.count(), 2)
+
+    def test_drain_writes_pending_votes(self):
+        """drain() writes the votes that are still queued."""
+        self.buffer.add(self.user1.pk, self.question.pk, self.choice1.pk)
+        self.buffer.drain()
+        self.assertEqual(Vote.objects.count(), 1)
+
+    @override_settings(VOTE_BUFFER_ENABLED=True)
+    def test_vote_view_until_flush(self):
+        """
+        A buffered vote is reported as recorded, not saved, and the detail
+        page shows the user's vote from the database until it is written.
+        """
+        self.client.force_login(self.user1)
+        detail_url = reverse("polls:detail", args=(self.question.id,))
+        with mock.patch("polls.views.get_vote_buffer",
+                        return_value=self.buffer):
+            response = self.client.post(
+                reverse("polls:vote", args=(self.question.id,)),
+                {"choice": self.choice1.id}, follow=True)
+        self.assertContains(response, "has been recorded")
+        self.assertIsNone(self.client.get(detail_url)
+                          .context["choice_voted"])
+        self.buffer.flush()
+        self.assertEqual(self.client.get(detail_url).context["choice_voted"],
+                         self.choice1.id)
@@ -0,0 +1,59 @@
+"""Tests of the per-choice vote counters."""
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.urls import reverse
+from polls.models import Question, Choice, Vote
+from polls.voting import delete_votes
+
+
+class VoteCountTest(TestCase):
+    """Tests of the per-choice vote counters."""
+    def setUp(self):
+        """Create a user and a question with two choices."""
+        super().setUp()
+        self.user = User.objects.create_user(username="voter",
+                                             password="FatChance!")
+        self.client.login(username="voter", password="FatChance!")
+        self.question = Question.objects.create(question_text="Counter")
+        self.choice1 = Choice.objects.create(question=self.question,
+                                             choice_text="One")
+        self.choice2 = Choice.objects.create(question=self.question,
+                                             choice_text="Two")
+        self.vote_url = reverse("polls:vote", args=(self.question.id,))
+
+    def test_new_vote_increments_counter(self):
+        """Voting for a choice adds one to its counter."""
+        self.client.post(self.vote_url, {"choice": self.choice1.id})
+        self.choice1.refresh_from_db()
+        self.assertEqual(self.choice1.votes, 1)
+
+    def test_changed_vote_moves_counter(self):
+        """Changing a vote moves one vote from the old to the new choice."""
+        self.client.post(self.vote_url, {"choice": self.choice1.id})
+        self.client.post(self.vote_url, {"choice": self.choice2.id})
+        self.choice1.refresh_from_db()
+        self.choice2.refresh_from_db()
+        self.assertEqual(self.choice1.votes, 0)
+        self.assertEqual(self.choice2.votes, 1)
+        self.assertEqual(Vote.objects.count(), 1)
+
+    def test_deleted_vote_decrements_counter(self):
+        """Deleting a vote removes it from the counter."""
+        self.client.post(self.vote_url, {"choice": self.choice1.id})
+        delete_votes(Vote.objects.filter(user=self.user))
+        self.choice1.refresh_from_db()
+        self.assertEqual(self.choice1.votes, 0)
+
+    def test_recount_votes_command(self):
+        """recount_votes detects and repairs counters that are out of sync."""
+        self.client.post(self.vote_url, {"choice": self.choice1.id})
+        Choice.objects.filter(pk=self.choice1.pk).update(vote_count=7)
+        with self.assertRaises(CommandError):
+            call_command("recount_votes", "--check", stdout=StringIO())
+        call_command("recount_votes", stdout=StringIO())
+        self.choice1.refresh_from_db()
+        self.assertEqual(self.choice1.votes, 1)
+        call_command("recount_votes", "--check", stdout=StringIO())
@@ -0,0 +1,159 @@
+"""Tests of the vote event log and its compaction."""
+import datetime
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from polls.history import PERIODS, compact_events, vote_history
+from polls.models import Question, Choice, Vote, VoteCheckpoint, VoteEvent
+from polls.voting import cast_vote, delete_votes
+
+HOUR = PERIODS["hour"]
+START = datetime.datetime(2024, 5, 1, 10, tzinfo=datetime.timezone.utc)
+
+
+class VoteEventTest(TestCase):
+    """Tests of the vote event log."""
+    def setUp(self):
+        """Create two users and a question with two choices."""
+        super().setUp()
+        self.alice = User.objects.create_user(username="alice")
+        self.bob = User.objects.create_user(username="bob")
+        self.question = Question.objects.create(question_text="Events")
+        self.choice1 = Choice.objects.create(question=self.question,
+                                             choice_text="One")
+        self.choice2 = Choice.objects.create(question=self.question,
+                                             choice_text="Two")
+
+    def events(self):
+        return list(VoteEvent.objects.order_by("id").values_list(
+            "user_id", "old_choice_id", "new_choice_id"))
+
+    def test_vote_and_change_are_logged(self):
+        """A first vote and a changed vote each append an event."""
+        cast_vote(self.alice, self.choice1)
+        cast_vote(self.alice, self.choice1)
+        cast_vote(self.alice, self.choice2)
+        self.assertEqual(self.events(), [
+            (self.alice.id, None, self.choice1.id),
+            (self.alice.id, self.choice1.id, self.choice2.id),
+        ])
+
+    def test_deleted_vote_is_logged(self):
+        """Deleting a vote, or its user, logs the removal."""
+        cast_vote(self.alice, self.choice1)
+        cast_vote(self.bob, self.choice2)
+        delete_votes(Vote.objects.filter(user=self.alice))
+        self.bob.delete()
+        self.assertEqual(self.events()[2:], [
+            (self.alice.id, self.choice1.id, None),
+            (None, self.choice2.id, None),
+        ])
+
+    def test_deleted_question_is_not_logged(self):
+        """Deleting a question deletes its votes and events silently."""
+        cast_vote(self.alice, self.choice1)
+        self.question.delete()
+        self.assertFalse(VoteEvent.objects.exists())
+
+    def test_cascades_delete_votes_in_bulk(self):
+        """
+        Votes deleted with their question take the same queries however
+        many there are, and a deleted user's votes a few per choice.
+        """
+        def delete_question(voters):
+            question = Question.objects.create(question_text="Bulk")
+            choice = Choice.objects.create(question=question,
+                                           choice_text="One")
+            for voter in voters:
+                cast_vote(voter, choice)
+            with CaptureQueriesContext(connection) as queries:
+                question.delete()
+            return len(queries)
+
+        users = [User.objects.create_user(username=f"user{n}")
+                 for n in range(5)]
+        self.assertEqual(delete_question(users[:1]), delete_question(users))
+        cast_vote(self.alice, self.choice1)
+        cast_vote(self.bob, self.choice1)
+        self.bob.delete()
+        self.choice1.refresh_from_db()
+        self.assertEqual(self.choice1.vote_count, 1)
+
+
+class CompactionTest(TestCase):
+    """Tests of compact_events() and vote_history()."""
+    def setUp(self):
+        """Create a question with two choices and a log of vote events."""
+        super().setUp()
+        self.question = Question.objects.create(question_text="History")
+        self.choice1 = Choice.objects.create(question=self.question,
+                                             choice_text="One")
+        self.choice2 = Choice.objects.create(question=self.question,
+                                             choice_text="Two")
+        one, two = self.choice1.id, self.choice2.id
+        # (minutes after START, old choice, new choice)
+        log = [(5, None, one), (20, None, one), (70, one, two),
+               (75, None, two), (190, two, None), (200, None, one)]
+        VoteEvent.objects.bulk_create(
+            VoteEvent(question=self.question, old_choice_id=old,
+                      new_choice_id=new,
+                      timestamp=START + datetime.timedelta(minutes=minutes))
+            for minutes, old, new in log)
+        self.times = [START + datetime.timedelta(minutes=minutes)
+                      for minutes in (0, 10, 30, 70, 80, 150, 195, 240)]
+        self.expected = [{}, {one: 1}, {one: 2}, {one: 1, two: 1},
+                         {one: 1, two: 2}, {one: 1, two: 2},
+                         {one: 1, two: 1}, {one: 2, two: 1}]
+
+    def history(self):
+        return [counts for _, counts in vote_history(self.question,
+                                                     self.times)]
+
+    def test_history_from_events(self):
+        """The history adds up the events before each time."""
+        self.assertEqual(self.history(), self.expected)
+
+    def test_compaction_keeps_history_of_period_ends(self):
+        """
+        Compaction leaves one checkpoint per choice at the end of each hour
+        with events, and the events after the cutoff.
+        """
+        # the cutoff is rounded down to 13:00
+        folded = compact_events(START + datetime.timedelta(minutes=195),
+                                HOUR)
+        self.assertEqual(folded, 4)
+        self.assertEqual(VoteEvent.objects.count(), 2)
+        self.assertEqual(
+            sorted(VoteCheckpoint.objects.values_list("at", flat=True)
+                   .distinct()),
+            [START + HOUR, START + 2 * HOUR])
+        history = self.history()
+        # times inside a compacted hour see its start; the others are exact
+        for index in (0, 5, 6, 7):
+            self.assertEqual(history[index], self.expected[index])
+
+    def test_compaction_is_incremental(self):
+        """A second compaction continues from the last checkpoint."""
+        compact_events(START + HOUR, HOUR)
+        compact_events(START + 5 * HOUR, HOUR)
+        self.assertFalse(VoteEvent.objects.exists())
+        self.assertEqual(self.history()[-1], self.expected[-1])
+        self.assertEqual(compact_events(START + 5 * HOUR, HOUR), 0)
+
+    def test_command(self):
+        """compact_vote_events folds the events older than --keep-days."""
+        out = StringIO()
+        call_command("compact_vote_events", "--keep-days", "1", "--period",
+                     "day", stdout=out)
+        self.assertIn("Compacted 6 vote event(s) and deleted 0 minute "
+                      "rollup(s).", out.getvalue())
+        # one checkpoint per choice at the end of the day
+        end_of_day = START.replace(hour=0) + PERIODS["day"]
+        self.assertEqual(VoteCheckpoint.objects.filter(at=end_of_day).count(),
+                         2)
+        self.assertEqual(vote_history(self.question, [end_of_day])[0][1],
+                         self.expected[-1])
@@ -1,8 +1,11 @@
 """Tests of voting."""
 import datetime
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
 from django.test import TestCase
 from django.utils import timezone
-from polls.models import Question
+from polls.models import Question, Choice, Vote
+from polls.voting import cast_vote
 
 
 class VotingTest(TestCase):
@@ -41,3 +44,73 @@ class VotingTest(TestCase):
         time = timezone.now()
         end_date_is_now = Question(end_date=time)
         self.assertIs(end_date_is_now.can_vote(), False)
+
+
+class OneVotePerQuestionTest(TestCase):
+    """Tests that a user has at most one vote per question."""
+    def setUp(self):
+        """Create a user and a question with two choices."""
+        super().setUp()
+        self.user = User.objects.create_user(username="voter")
+        self.question = Question.objects.create(question_text="Unique")
+        self.choice1 = Choice.objects.create(question=self.question,
+                                             choice_text="One")
+        self.choice2 = Choice.objects.create(question=self.question,
+                                             choice_text="Two")
+
+    def test_vote_records_question(self):
+        """A vote stores the question of its choice."""
+        vote = cast_vote(self.user, self.choice1)
+        self.assertEqual(vote.question, self.question)
+
+    def test_repeated_votes_keep_one_row(self):
+        """Voting again replaces the user's vote instead of adding one."""
+        cast_vote(self.user, self.choice1)
+        cast_vote(self.user, self.choice2)
+        cast_vote(self.user, self.choice2)
+        vote = Vote.objects.get(user=self.user, question=self.question)
+        self.assertEqual(vote.choice, self.choice2)
+
+    def test_database_rejects_duplicate_vote(self):
+        """A second Vote row for the same user and question is rejected."""
+        cast_vote(self.user, self.choice1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Vote.objects.create(user=self.user, question=self.question,
+                                choice=self.choice2)
+
+
+class QuestionStateQuerySetTest(TestCase):
+    """Tests of the poll state filters on Question.objects."""
+    def setUp(self):
+        """Create a future, an open, an open-ended and a closed question."""
+        super().setUp()
+        now = timezone.now()
+        day = datetime.timedelta(days=1)
+        self.future = Question.objects.create(
+            question_text="Future", pub_date=now + day)
+        self.open = Question.objects.create(
+            question_text="Open", pub_date=now - day, end_date=now + day)
+        self.no_end = Question.objects.create(
+            question_text="No end", pub_date=now - day)
+        self.closed = Question.objects.create(
+            question_text="Closed", pub_date=now - 2 * day, end_date=now - day)
+
+    def test_published(self):
+        """published() excludes questions with a future pub_date."""
+        self.assertQuerySetEqual(Question.objects.published(),
+                                 [self.open, self.no_end, self.closed],
+                                 ordered=False)
+
+    def test_open_for_voting(self):
+        """open_for_voting() returns the questions where can_vote()."""
+        self.assertQuerySetEqual(Question.objects.open_for_voting(),
+                                 [self.open, self.no_end], ordered=False)
+
+    def test_closed(self):
+        """closed() returns published questions that have ended."""
+        self.assertQuerySetEqual(Question.objects.closed(), [self.closed])
+
+    def test_is_open_matches_can_vote(self):
+        """The is_open annotation agrees with can_vote() for every row."""
+        for question in Question.objects.with_is_open():
+            self.assertIs(question.is_open, question.can_vote())
@@ -1,28 +1,272 @@
-from django.http import HttpResponseRedirect, Http404
+import asyncio
+import datetime
+import hashlib
+import hmac
+import json
+import time
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Min, Q
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.http import (HttpResponse, HttpResponseBadRequest,
+                         HttpResponseRedirect, Http404, JsonResponse,
+                         StreamingHttpResponse)
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib import messages
+from django.template.loader import render_to_string
 from django.urls import reverse
 from django.views import generic
+from django.views.decorators.http import require_POST
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.utils.functional import SimpleLazyObject, cached_property
+from django.utils.safestring import mark_safe
 
+from .authoring import create_questions
+from .broadcast import broadcaster
+from .buffer import get_vote_buffer
+from .cache import get_version, peek_version
+from .export import (EXPORT_FORMATS, format_rows, question_results,
+                     question_votes)
+from .history import BUCKETS, rollup_history
+from .metrics import render_metrics
 from .models import Choice, Question, Vote
+from .proxies import client_ip
+from .ratelimit import limit_votes
+from .voting import (cast_vote, forget_votes, get_session_vote,
+                     remember_vote)
 
 
-class IndexView(generic.ListView):
+class CachedFragmentMixin:
+    """
+    Builds a page around a fragment that is rendered once per version of
+    its data and kept in the cache.  Pages built from a cached fragment
+    carry an ETag and Last-Modified, so that conditional requests are
+    answered with 304 Not Modified without rendering anything.
+    """
+    fragment_template_name = None
+
+    def get_fragment_key(self):
+        """Return a cache key that changes whenever the fragment would."""
+        raise NotImplementedError
+
+    def get_fragment_context(self):
+        """Return the context for rendering the fragment."""
+        raise NotImplementedError
+
+    def get_fragment_timeout(self):
+        """Return how many seconds the fragment may be cached."""
+        return None
+
+    def get_validators(self, key, entry):
+        """
+        Return the (ETag, Last-Modified) of the page, or None if the page
+        must not be revalidated because it is not cached or has flash
+        messages to show.
+        """
+        if entry is None or len(messages.get_messages(self.request)):
+            return None
+        user_id = self.request.user.pk or 0
+        tag = hashlib.md5(f"{key}:{entry[0]}:{user_id}".encode()).hexdigest()
+        return f'"{tag}"', entry[0] // 10**9
+
+    def render_page(self, context):
+        """
+        Render the page with the cached fragment as `fragment` in the
+        context, or answer a conditional request with 304.
+        """
+        key = self.get_fragment_key()
+        # (time rendered in nanoseconds, html)
+        entry = cache.get(key)
+        response = self.get_not_modified(key, entry)
+        if response is not None:
+            return response
+        if entry is None:
+            entry = self.cache_fragment(key, self.get_fragment_context())
+        return self.render_with_fragment(key, entry, context)
+
+    async def arender_page(self, context):
+        """
+        Async version of render_page(), with the fragment key and context
+        from aget_fragment_key() and aget_fragment_context().  The cache
+        may be a file or a server, so it is read with the async methods.
+        """
+        # get_validators() reads the user and the session
+        await aget_user(self.request)
+        key = await self.aget_fragment_key()
+        entry = await cache.aget(key)
+        response = self.get_not_modified(key, entry)
+        if response is not None:
+            return response
+        if entry is None:
+            entry = await self.acache_fragment(
+                key, await self.aget_fragment_context())
+        return self.render_with_fragment(key, entry, context)
+
+    async def aget_fragment_key(self):
+        """Async version of get_fragment_key()."""
+        return await sync_to_async(self.get_fragment_key)()
+
+    async def aget_fragment_context(self):
+        """Async version of get_fragment_context()."""
+        return await sync_to_async(self.get_fragment_context)()
+
+    def get_not_modified(self, key, entry):
+        """Return a 304 response if the client's copy is current."""
+        validators = self.get_validators(key, entry)
+        if validators is None:
+            return None
+        etag, last_modified = validators
+        return get_conditional_response(self.request, etag=etag,
+                                        last_modified=last_modified)
+
+    def cache_fragment(self, key, fragment_context):
+        """Render the fragment, cache it and return its cache entry."""
+        entry, timeout = self.render_fragment(fragment_context)
+        cache.set(key, entry, timeout)
+        return entry
+
+    async def acache_fragment(self, key, fragment_context):
+        """Async version of cache_fragment(); renders in a worker thread."""
+        entry, timeout = await sync_to_async(self.render_fragment)(
+            fragment_context)
+        await cache.aset(key, entry, timeout)
+        return entry
+
+    def render_fragment(self, fragment_context):
+        """Return the cache entry of a new rendering and its timeout."""
+        html = render_to_string(self.fragment_template_name, fragment_context)
+        return (time.time_ns(), html), self.get_fragment_timeout()
+
+    def render_with_fragment(self, key, entry, context):
+        """Render the page around a cached fragment."""
+        context["fragment"] = mark_safe(entry[1])
+        response = render(self.request, self.template_name, context)
+        validators = self.get_validators(key, entry)
+        if validators:
+            etag, last_modified = validators
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(last_modified)
+        patch_cache_control(response, no_cache=True)
+        return response
+
+
+async def aget_user(request):
+    """
+    Return request.user, loading it in a thread.  The lazy user (and the
+    session behind it) is read with sync queries, and Django 4.2 has no
+    request.auser() yet.
+    """
+    def load():
+        # evaluates the lazy object
+        request.user.is_authenticated
+        return request.user
+    return await sync_to_async(load)()
+
+
+class IndexView(CachedFragmentMixin, generic.ListView):
     """
     View for the index page.
+
+    Questions are shown newest first, `page_size` at a time.  The next page
+    starts after the `cursor` (pub_date and id of the last question shown),
+    so no page needs an OFFSET scan.  The rendered list is cached until any
+    question is saved or the next scheduled question is published.
     """
     template_name = "polls/index.html"
+    fragment_template_name = "polls/question_list.html"
     context_object_name = "latest_question_list"
+    page_size = 10
 
     def get_queryset(self):
         """
-        Return the last five published questions (not including those set to be
-        published in the future).
+        Return the published questions (not including those set to be
+        published in the future) of the requested page.
+        """
+        now = timezone.now()
+        queryset = Question.objects.published(now).with_is_open(now) \
+            .order_by("-pub_date", "-id")
+        cursor = self.parse_cursor(self.request.GET.get("cursor"))
+        if cursor:
+            pub_date, pk = cursor
+            queryset = queryset.filter(
+                Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, id__lt=pk))
+        return queryset
+
+    @staticmethod
+    def parse_cursor(cursor):
+        """
+        Return the (pub_date in UTC, id) in a cursor, or None if it is
+        invalid.
+        """
+        try:
+            pub_date, pk = cursor.rsplit(",", 1)
+            pub_date = datetime.datetime.fromisoformat(pub_date)
+            if timezone.is_naive(pub_date):
+                pub_date = timezone.make_aware(pub_date)
+            return pub_date.astimezone(datetime.timezone.utc), int(pk)
+        except (AttributeError, ValueError, OverflowError):
+            return None
+
+    @cached_property
+    def page(self):
+        """Return the questions of this page and the cursor of the next."""
+        questions = list(self.get_queryset()[:self.page_size + 1])
+        next_cursor = None
+        if len(questions) > self.page_size:
+            questions = questions[:self.page_size]
+            last = questions[-1]
+            next_cursor = f"{last.pub_date.isoformat()},{last.id}"
+        return questions, next_cursor
+
+    def get_fragment_key(self):
+        """Return a key per page, with "" for the first page."""
+        cursor = self.parse_cursor(self.request.GET.get("cursor"))
+        page = f"{cursor[0].isoformat()},{cursor[1]}" if cursor else ""
+        return "polls:index:{}:{}".format(get_version("questions"), page)
+
+    def get_fragment_context(self):
+        """Return the questions of the page and the link to the next."""
+        questions, next_cursor = self.page
+        return {
+            "latest_question_list": questions,
+            "next_page": (f"?{urlencode({'cursor': next_cursor})}"
+                          if next_cursor else None),
+        }
+
+    def get_fragment_timeout(self):
+        """
+        Return how long the question list may be cached: until the next
+        scheduled question is published or closed, at most
+        INDEX_CACHE_TIMEOUT.
+        """
+        timeout = settings.INDEX_CACHE_TIMEOUT
+        now = timezone.now()
+        # one query per column, so that each reads from its index
+        upcoming = [
+            Question.objects.filter(**{f"{field}__gt": now})
+            .aggregate(when=Min(field))["when"]
+            for field in ("pub_date", "end_date")
+        ]
+        for when in upcoming:
+            if when is not None:
+                timeout = min(timeout, int((when - now).total_seconds()))
+        return timeout
+
+    def get(self, request, *args, **kwargs):
+        """
+        Returns the index page, rendering the question list only if it
+        is not cached.
         """
-        return Question.objects.filter(
-            pub_date__lte=timezone.now()).order_by("-pub_date")
+        return self.render_page({
+            # evaluated only when something reads it, not on cache hits
+            self.context_object_name: SimpleLazyObject(lambda: self.page[0]),
+        })
 
 
 class DetailView(generic.DetailView):
@@ -36,16 +280,17 @@ class DetailView(generic.DetailView):
         """
         Excludes any questions that aren't published yet.
         """
-        return Question.objects.filter(pub_date__lte=timezone.now())
+        return Question.objects.published()
 
     def get(self, request, *args, **kwargs):
         """
         Returns the detail page for a question.
         """
         try:
-            question = get_object_or_404(Question, pk=kwargs["pk"])
+            question = get_object_or_404(Question.objects.with_is_open(),
+                                         pk=kwargs["pk"])
 
-            if not question.can_vote():
+            if not question.is_open:
                 messages.error(request, "This page doesn't allow voting.")
                 return redirect("polls:index")
         except Http404:
@@ -53,44 +298,236 @@ class DetailView(generic.DetailView):
             return redirect("polls:index")
         choice_voted = None
         if request.user.is_authenticated:
-            try:
-                vote = Vote.objects.get(user=request.user,
-                                        choice__in=question.choice_set.all())
-                choice_voted = vote.choice.choice_text
-            except Vote.DoesNotExist:
-                choice_voted = None
+            choice_voted = get_session_vote(request, question.id)
 
         return render(request, self.template_name,
-                      {"question": question, "choice_voted": choice_voted})
+                      {"question": question,
+                       "choices": question.choice_set.all(),
+                       "choice_voted": choice_voted})
 
 
-class ResultsView(generic.DetailView):
+class ResultsView(CachedFragmentMixin, generic.DetailView):
     """
     View for the results page.
+
+    The results table is cached until the next vote on the question, at
+    most RESULTS_CACHE_TIMEOUT seconds: a process with its own in-memory
+    cache does not see the votes that other processes save.
     """
     model = Question
     template_name = "polls/results.html"
+    fragment_template_name = "polls/results_table.html"
+
+    def get_fragment_key(self):
+        """Return a key per question and version of its vote counts."""
+        pk = self.kwargs["pk"]
+        # only stamp versions for questions that exist
+        if peek_version(f"results:{pk}") is None \
+                and not Question.objects.filter(pk=pk).exists():
+            raise Http404("No question matches the given query.")
+        return self.format_fragment_key(pk, get_version(f"results:{pk}"))
+
+    def get_fragment_timeout(self):
+        """Return RESULTS_CACHE_TIMEOUT."""
+        return settings.RESULTS_CACHE_TIMEOUT
+
+    @staticmethod
+    def format_fragment_key(pk, version):
+        """Return the key of a version of a question's results table."""
+        return "polls:results:{}:{}".format(pk, version)
+
+    def get_fragment_context(self):
+        """Return the question and its choices with their results."""
+        question = get_object_or_404(
+            Question.objects.select_related("snapshot"), pk=self.kwargs["pk"])
+        choices = question.results()
+        total_votes = choices[0].total_votes if choices else 0
+        return {"question": question, "choices": choices,
+                "total_votes": total_votes}
 
     def get(self, request, *args, **kwargs):
         """
         Returns the results page for a question.
         """
-        question = get_object_or_404(Question, pk=kwargs["pk"])
-        return render(request, self.template_name, {"question": question})
+        return self.render_page({"question_id": kwargs["pk"],
+                                 "live_results": settings.POLLS_ASYNC_VIEWS})
+
+
+def results_history(request, pk):
+    """
+    Returns the vote counts of a question over time as JSON: for each of
+    the last `limit` minutes, hours or days (`bucket`) with votes, the
+    change and the total of every choice.  Only the rollups are read, and
+    the response is cached until the next vote on the question, at most
+    RESULTS_CACHE_TIMEOUT seconds.
+
+    The history starts with the vote event log: votes cast before it show
+    up together when migration 0009_vote_events was applied, and votes
+    folded into a checkpoint just before that checkpoint.
+    """
+    bucket = request.GET.get("bucket", "hour")
+    try:
+        limit = min(int(request.GET.get("limit", 100)), 1000)
+    except ValueError:
+        limit = 0
+    if bucket not in BUCKETS or limit < 1:
+        return HttpResponseBadRequest("Unknown bucket or invalid limit.")
+    # only stamp versions for questions that exist
+    if peek_version(f"results:{pk}") is None \
+            and not Question.objects.filter(pk=pk).exists():
+        raise Http404("No question matches the given query.")
+    key = "polls:results_history:{}:{}:{}:{}".format(
+        pk, bucket, limit, get_version(f"results:{pk}"))
+    data = cache.get(key)
+    if data is None:
+        question = get_object_or_404(Question, pk=pk)
+        choices = question.choice_set.order_by("id").values_list(
+            "id", "choice_text")
+        data = {
+            "question": question.id,
+            "bucket": bucket,
+            "choices": [{"id": choice_id, "text": text}
+                        for choice_id, text in choices],
+            "buckets": [{"start": start.isoformat(), "votes": change,
+                         "totals": totals}
+                        for start, change, totals in rollup_history(
+                            question, bucket, limit)],
+        }
+        cache.set(key, data, settings.RESULTS_CACHE_TIMEOUT)
+    return JsonResponse(data)
+
+
+async def results_stream(request, pk):
+    """
+    Streams the vote counts of a question as Server-Sent Events.
+
+    The first event has the count of every choice; later events only the
+    choices whose count changed, or a `choices` event with every count
+    when choices were added or deleted.  The stream ends after
+    RESULTS_STREAM_TIMEOUT seconds and the browser reconnects.
+
+    Under WSGI the whole stream would be read before anything is sent, so
+    without POLLS_ASYNC_VIEWS this answers 204, which tells the browser
+    not to reconnect.
+    """
+    if not settings.POLLS_ASYNC_VIEWS:
+        return HttpResponse(status=204)
+    if not await Question.objects.filter(pk=pk).aexists():
+        raise Http404("This question does not exist.")
+    response = StreamingHttpResponse(_results_events(pk),
+                                     content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # ask nginx not to buffer the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+async def _results_events(question_id):
+    """Yield an event whenever the question's vote counts change."""
+    interval = settings.RESULTS_STREAM_INTERVAL
+    sent = {}
+    sent_version = None
+    yield f"retry: {int(interval * 1000)}\n\n"
+    for _ in range(int(settings.RESULTS_STREAM_TIMEOUT / interval)):
+        if broadcaster.version(question_id) != sent_version:
+            sent_version, counts = await broadcaster.get_counts(question_id)
+            changed = {str(pk): n for pk, n in counts.items()
+                       if sent.get(pk) != n}
+            if sent and counts.keys() != sent.keys():
+                all_counts = {str(pk): n for pk, n in counts.items()}
+                yield f"event: choices\ndata: {json.dumps(all_counts)}\n\n"
+            elif changed:
+                yield f"event: votes\ndata: {json.dumps(changed)}\n\n"
+            sent = counts
+        else:
+            # keep proxies from closing an idle connection
+            yield ": ping\n\n"
+        await asyncio.sleep(interval)
 
 
+def metrics(request):
+    """
+    Returns the request metrics in the Prometheus text format, to clients
+    in METRICS_ALLOWED_IPS only, which must send METRICS_TOKEN if it is
+    set.
+    """
+    if client_ip(request) not in settings.METRICS_ALLOWED_IPS:
+        raise PermissionDenied
+    if settings.METRICS_TOKEN and not hmac.compare_digest(
+            request.headers.get("Authorization", ""),
+            f"Bearer {settings.METRICS_TOKEN}"):
+        raise PermissionDenied
+    return HttpResponse(render_metrics(),
+                        content_type="text/plain; version=0.0.4")
+
+
+@login_required
+def export(request, pk):
+    """
+    Streams the results of a question, or with kind=votes its raw votes
+    (staff only), as CSV or with format=jsonl as JSON Lines.
+    """
+    question = get_object_or_404(Question.objects.select_related("snapshot"),
+                                 pk=pk)
+    kind = request.GET.get("kind", "results")
+    export_format = request.GET.get("format", "csv")
+    if kind not in ("results", "votes") \
+            or export_format not in EXPORT_FORMATS:
+        return HttpResponseBadRequest("Unknown export kind or format.")
+    if kind == "votes":
+        if not request.user.is_staff:
+            raise PermissionDenied
+        rows = question_votes(question)
+    else:
+        rows = question_results(question)
+    response = StreamingHttpResponse(
+        format_rows(rows, export_format),
+        content_type=EXPORT_FORMATS[export_format])
+    filename = f"question-{question.id}-{kind}.{export_format}"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+@require_POST
+def bulk_create_questions(request):
+    """
+    Creates the questions, with their choices, of a JSON list in the
+    request body (staff only); see polls.authoring.parse_questions() for
+    the format.  Returns the ids of the new questions and choices.
+    """
+    if not request.user.is_staff:
+        raise PermissionDenied
+    try:
+        items = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({"errors": {"__all__": ["Invalid JSON."]}},
+                            status=400)
+    try:
+        created = create_questions(items)
+    except ValidationError as error:
+        errors = (error.message_dict if hasattr(error, "error_dict")
+                  else {"__all__": error.messages})
+        return JsonResponse({"errors": errors}, status=400)
+    return JsonResponse({"questions": [
+        {"id": question.id, "choices": [choice.id for choice in choices]}
+        for question, choices in created
+    ]}, status=201)
+
+
+@limit_votes
 @login_required
 def vote(request, question_id):
     """
     Handles voting for a particular choice in a question.
     """
     try:
-        question = get_object_or_404(Question, pk=question_id)
+        question = get_object_or_404(Question.objects.with_is_open(),
+                                     pk=question_id)
     except Http404:
         messages.error(request, "This question does not exist.")
         return redirect("polls:index")
 
-    if not question.can_vote():
+    if not question.is_open:
         messages.error(request, "This question page not allow voting.")
         return redirect("polls:index")
     try:
@@ -98,19 +535,33 @@ def vote(request, question_id):
     except (KeyError, Choice.DoesNotExist):
         messages.error(request, "You didn't select a choice.")
         return redirect("polls:detail", question_id)
-    this_user = request.user
-    try:
-        # find a vote by this user for this question
-        vote = Vote.objects.get(user=this_user, choice__question=question)
-        # update this vote
-        vote.choice = selected_choice
-    except Vote.DoesNotExist:
-        # no matching vote - create a new Vote
-        vote = Vote(user=this_user, choice=selected_choice)
-    # save the vote
-    vote.save()
+    if not settings.VOTE_BUFFER_ENABLED and Vote.objects.filter(
+            user=request.user, question=question,
+            choice=selected_choice).exists():
+        # a repeated submit of the saved choice; there is nothing to write,
+        # but the session may have missed a vote from another device
+        remember_vote(request, question.id, selected_choice.id)
+        return vote_saved(request, question)
+    if settings.VOTE_BUFFER_ENABLED:
+        # queue the vote; it is written with the next batch, so the
+        # session reloads the user's votes once it is
+        get_vote_buffer().add(request.user.pk, question.pk, selected_choice.pk)
+        forget_votes(request)
+        return vote_saved(request, question, queued=True)
+    # save the vote and update the vote counters
+    cast_vote(request.user, selected_choice)
+    remember_vote(request, question.id, selected_choice.id)
+
+    return vote_saved(request, question)
+
 
+def vote_saved(request, question, queued=False):
+    """
+    Confirm a vote, or with `queued` a buffered vote that is not written
+    yet, and redirect to the results of its question.
+    """
     # Display a message that the user's vote was successful.
+    verb = "recorded" if queued else "saved"
     messages.success(
-        request, f"Your vote for {question.question_text} has been saved.")
+        request, f"Your vote for {question.question_text} has been {verb}.")
     return HttpResponseRedirect(reverse("polls:results", args=(question.id,)))
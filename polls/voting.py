@@ -0,0 +1,253 @@
+"""Record votes and keep the per-choice vote counters in sync."""
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .broadcast import broadcaster
+from .cache import bump_version
+from .history import add_to_rollups
+from .models import Choice, QuestionResultSnapshot, Vote, VoteEvent
+
+
+def cast_vote(user, choice):
+    """
+    Save a vote by `user` for `choice`, replacing the user's earlier vote
+    on the same question if there is one.  Returns the saved Vote.
+    """
+    key = (user.pk, choice.question_id)
+    return apply_votes({key: choice.pk})[key]
+
+
+def apply_votes(batch):
+    """
+    Save many votes at once.  `batch` maps (user_id, question_id) to the
+    chosen choice_id; each entry replaces that user's earlier vote on the
+    question.  The votes and the counters of the affected choices are
+    written in a single transaction, and the unique (user, question)
+    constraint makes concurrent submissions collapse into one vote.
+    Returns a dict mapping each key of `batch` to its saved Vote.
+    """
+    try:
+        return _apply_votes(batch)
+    except IntegrityError:
+        # another request inserted one of these votes first; the retry
+        # sees its row and updates it instead
+        return _apply_votes(batch)
+
+
+def _apply_votes(batch):
+    """Write one batch of votes; see apply_votes."""
+    user_ids = {user_id for user_id, _ in batch}
+    question_ids = {question_id for _, question_id in batch}
+    deltas = Counter()
+    # the question of every choice in deltas, for the rollups
+    question_of = {}
+    created, changed, events = [], [], []
+    now = timezone.now()
+    with transaction.atomic():
+        votes = {
+            (vote.user_id, vote.question_id): vote
+            for vote in Vote.objects.select_for_update().filter(
+                user_id__in=user_ids, question_id__in=question_ids)
+        }
+        for (user_id, question_id), choice_id in batch.items():
+            vote = votes.get((user_id, question_id))
+            question_of[choice_id] = question_id
+            if vote is None:
+                vote = Vote(user_id=user_id, question_id=question_id,
+                            choice_id=choice_id, voted_at=now)
+                votes[(user_id, question_id)] = vote
+                created.append(vote)
+                deltas[choice_id] += 1
+                events.append(VoteEvent(
+                    user_id=user_id, question_id=question_id,
+                    new_choice_id=choice_id, timestamp=now))
+            elif vote.choice_id != choice_id:
+                question_of[vote.choice_id] = question_id
+                deltas[vote.choice_id] -= 1
+                deltas[choice_id] += 1
+                events.append(VoteEvent(
+                    user_id=user_id, question_id=question_id,
+                    old_choice_id=vote.choice_id, new_choice_id=choice_id,
+                    timestamp=now))
+                vote.choice_id = choice_id
+                vote.voted_at = now
+                changed.append(vote)
+        Vote.objects.bulk_create(created)
+        Vote.objects.bulk_update(changed, ["choice", "voted_at"])
+        VoteEvent.objects.bulk_create(events)
+        for choice_id, amount in deltas.items():
+            if amount:
+                _add_votes(choice_id, amount)
+        add_to_rollups(deltas, question_of, now)
+        changed_questions = {vote.question_id for vote in created + changed}
+        # e.g. a buffered vote flushed after its question ended
+        _discard_closed_snapshots(changed_questions, now)
+        transaction.on_commit(lambda: results_changed(changed_questions))
+    return {key: votes[key] for key in batch}
+
+
+def results_changed(question_ids):
+    """
+    Tell live results streams and cached results pages that the vote
+    counts of the questions changed.
+    """
+    broadcaster.publish(question_ids)
+    for question_id in question_ids:
+        bump_version(f"results:{question_id}")
+
+
+def delete_votes(votes, keep_user=True):
+    """
+    Delete the votes in the queryset `votes` and take them off the vote
+    counters with one UPDATE per choice, instead of a post_delete signal
+    that would load and update every vote on its own.  The removals are
+    appended to the vote event log and the rollups; with `keep_user`
+    False the events do not name the user, who is being deleted.
+    Returns the number of votes deleted.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(votes.select_for_update().values_list(
+            "user_id", "question_id", "choice_id"))
+        if not rows:
+            return 0
+        votes.delete()
+        deltas = Counter()
+        question_of = {}
+        for user_id, question_id, choice_id in rows:
+            deltas[choice_id] -= 1
+            question_of[choice_id] = question_id
+        VoteEvent.objects.bulk_create(
+            VoteEvent(user_id=user_id if keep_user else None,
+                      question_id=question_id, old_choice_id=choice_id,
+                      timestamp=now)
+            for user_id, question_id, choice_id in rows)
+        for choice_id, amount in deltas.items():
+            _add_votes(choice_id, amount)
+        add_to_rollups(deltas, question_of, now)
+        changed_questions = set(question_of.values())
+        _discard_closed_snapshots(changed_questions, now)
+        transaction.on_commit(lambda: results_changed(changed_questions))
+    return len(rows)
+
+
+def _discard_closed_snapshots(question_ids, now):
+    """Delete the snapshots of those questions that ended by `now`."""
+    QuestionResultSnapshot.objects.filter(
+        question_id__in=question_ids, question__end_date__lte=now).delete()
+
+
+def _add_votes(choice_id, amount):
+    """Atomically add `amount` to the vote counter of a choice."""
+    Choice.objects.filter(pk=choice_id).update(
+        vote_count=F("vote_count") + amount)
+
+
+def recount_votes(fix=True):
+    """
+    Compare every choice's vote counter with the number of Vote rows
+    that reference it.  Returns a list of (choice, counted) pairs for the
+    choices whose counter was wrong; when `fix` is True those counters are
+    overwritten with the counted value.
+    """
+    mismatched = []
+    choices = Choice.objects.annotate(counted=Count("vote"))
+    for choice in choices.iterator():
+        if choice.vote_count != choice.counted:
+            mismatched.append((choice, choice.counted))
+    if fix and mismatched:
+        with transaction.atomic():
+            for choice, counted in mismatched:
+                Choice.objects.filter(pk=choice.pk).update(vote_count=counted)
+    return mismatched
+
+
+# Session key of the {question_id: choice_id} map of the user's votes.
+# Keys are strings because the session is stored as JSON.
+SESSION_VOTES_KEY = "polls_votes"
+# Session key of the time until which the map is reloaded on every use,
+# because a buffered vote of the user may not be written yet.
+SESSION_VOTES_RELOAD_KEY = "polls_votes_reload_until"
+
+
+def _session_votes_stale(request):
+    """Return True if the session's vote map must be loaded again."""
+    reload_until = request.session.get(SESSION_VOTES_RELOAD_KEY)
+    if reload_until is None:
+        return request.session.get(SESSION_VOTES_KEY) is None
+    if reload_until < time.time():
+        del request.session[SESSION_VOTES_RELOAD_KEY]
+    return True
+
+
+def load_session_votes(request, user):
+    """Store the user's votes in the session with one query."""
+    votes = Vote.objects.filter(user=user).values_list("question_id",
+                                                       "choice_id")
+    request.session[SESSION_VOTES_KEY] = {
+        str(question_id): choice_id for question_id, choice_id in votes}
+    return request.session[SESSION_VOTES_KEY]
+
+
+def get_session_vote(request, question_id):
+    """Return the id of the choice the user voted for, or None."""
+    if _session_votes_stale(request):
+        # the session was started before the map was introduced, or a
+        # buffered vote may have been written since
+        return load_session_votes(request, request.user).get(
+            str(question_id))
+    return request.session[SESSION_VOTES_KEY].get(str(question_id))
+
+
+def remember_vote(request, question_id, choice_id):
+    """Record a new vote of the user in the session."""
+    votes = request.session.get(SESSION_VOTES_KEY)
+    if votes is None:
+        votes = load_session_votes(request, request.user)
+    votes[str(question_id)] = choice_id
+    request.session.modified = True
+
+
+def forget_votes(request):
+    """
+    Drop the session's copy of the user's votes after queueing a buffered
+    vote, so that it is loaded from the database until the vote buffer
+    has been flushed.
+    """
+    request.session.pop(SESSION_VOTES_KEY, None)
+    request.session[SESSION_VOTES_RELOAD_KEY] = (
+        time.time() + settings.VOTE_BUFFER_FLUSH_INTERVAL)
+
+
+async def aload_session_votes(request, user):
+    """Async version of load_session_votes()."""
+    votes = Vote.objects.filter(user=user).values_list("question_id",
+                                                       "choice_id")
+    request.session[SESSION_VOTES_KEY] = {
+        str(question_id): choice_id async for question_id, choice_id in votes}
+    return request.session[SESSION_VOTES_KEY]
+
+
+async def aget_session_vote(request, user, question_id):
+    """
+    Async version of get_session_vote(), for a session that is already
+    loaded (see polls.views.aget_user()).
+    """
+    if _session_votes_stale(request):
+        return (await aload_session_votes(request, user)).get(
+            str(question_id))
+    return request.session[SESSION_VOTES_KEY].get(str(question_id))
+
+
+async def aremember_vote(request, user, question_id, choice_id):
+    """Async version of remember_vote(), for a loaded session."""
+    votes = request.session.get(SESSION_VOTES_KEY)
+    if votes is None:
+        votes = await aload_session_votes(request, user)
+    votes[str(question_id)] = choice_id
+    request.session.modified = True